@@ -0,0 +1,35 @@
+"""Közös mérési segédfüggvények a benchmarkokhoz (percentilis, időmérés, összesítés).
+
+A benchmarkok szkriptként futnak (python benchmarks/<név>.py), így a benchmarks/
+könyvtár a sys.path elején van: from _stats import ...
+"""
+import time
+import statistics
+
+def percentile(values, p):
+    """Legközelebbi rang szerinti percentilis (p: 0-100); üres listára None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def time_calls(fn, repeat):
+    """fn() futtatása repeat-szer: (utolsó eredmény, időtartamok ms-ban)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return result, timings
+
+def summarize(timings_ms, percentiles=(50, 95), digits=2):
+    """Átlag, a kért percentilisek és a maximum ms-ban; üres listára üres dict."""
+    if not timings_ms:
+        return {}
+    summary = {"mean_ms": round(statistics.mean(timings_ms), digits)}
+    for p in percentiles:
+        summary[f"p{p}_ms"] = round(percentile(timings_ms, p), digits)
+    summary["max_ms"] = round(max(timings_ms), digits)
+    return summary
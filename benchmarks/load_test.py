@@ -0,0 +1,226 @@
+"""Terheléses benchmark a /v1/chat/completions végpontra (p50/p95/p99, TTFT, req/s).
+
+Alapesetben egy már futó SoulCore példányt hajt meg. A --spawn kapcsolóval egy
+ideiglenes munkakönyvtárban elindítja a stub szervereket (benchmarks/stub_servers.py)
+és egy SoulCore példányt, amelynek a configja a stubokra mutat, így a teljes
+pipeline GPU nélkül, megismételhetően mérhető. Az eredmény JSON-ba menthető, a
+futások így összehasonlíthatók.
+
+Futtatás a projekt gyökeréből:
+    python benchmarks/load_test.py --spawn --concurrency 8 --requests 200 --output bench.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --stream --concurrency 4
+
+A --spawn munkakönyvtára (DB, logok) a futás végén törlődik; --keep esetén megmarad.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import yaml
+import httpx
+
+from _stats import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Vegyes terhelés: keresést igénylő, belső (csevegés, kód) és kétes kérdések
+PROMPTS = [
+    "Ki Budapest jelenlegi főpolgármestere?",
+    "Milyen idő lesz holnap Debrecenben?",
+    "Szia, hogy vagy ma?",
+    "Írj egy rövid verset az őszről.",
+    "Számold ki, mennyi 17 * 23.",
+    "Mi a különbség a TCP és az UDP között?",
+    "Mennyibe kerül most egy liter benzin?",
+    "Javítsd ki a stílust ebben a mondatban: a kutya megy az utcán nagyon.",
+    "Mesélj a magyar honfoglalásról röviden.",
+    "Milyen hírek vannak ma a tőzsdén?",
+]
+
+async def one_request(client, url, prompt, conv_id, stream):
+    """Egy chat kérés; (teljes idő, első token ideje) másodpercben."""
+    payload = {
+        "model": "lelek-core-v1",
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": stream,
+        "chat_id": conv_id,
+    }
+    t0 = time.perf_counter()
+    if not stream:
+        resp = await client.post(url, json=payload)
+        resp.raise_for_status()
+        elapsed = time.perf_counter() - t0
+        return elapsed, elapsed
+
+    ttft = None
+    async with client.stream("POST", url, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            delta = json.loads(line[6:])["choices"][0].get("delta", {})
+            if ttft is None and delta.get("content"):
+                ttft = time.perf_counter() - t0
+    elapsed = time.perf_counter() - t0
+    return elapsed, ttft if ttft is not None else elapsed
+
+async def run_load(base_url, concurrency, total, stream, conversations, timeout):
+    url = f"{base_url.rstrip('/')}/v1/chat/completions"
+    latencies, ttfts, errors = [], [], []
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            prompt = PROMPTS[i % len(PROMPTS)]
+            try:
+                elapsed, ttft = await one_request(client, url, prompt, f"bench-{i % conversations}", stream)
+                latencies.append(elapsed)
+                ttfts.append(ttft)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        duration = time.perf_counter() - t0
+
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "concurrency": concurrency,
+        "stream": stream,
+        "duration_s": round(duration, 2),
+        "requests_per_s": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency": summarize([t * 1000 for t in latencies], percentiles=(50, 95, 99), digits=1),
+        "ttft": summarize([t * 1000 for t in ttfts], percentiles=(50, 95, 99), digits=1),
+    }
+
+async def wait_until_up(url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.3)
+    return False
+
+def prepare_workdir(args):
+    """Ideiglenes munkakönyvtár a stubokra mutató configgal (saját DB, logok)."""
+    workdir = tempfile.mkdtemp(prefix="soulcore-bench-")
+    shutil.copytree(os.path.join(ROOT, "config"), os.path.join(workdir, "config"))
+    cfg_path = os.path.join(workdir, "config", "main_config.yaml")
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+
+    cfg.setdefault("api", {}).update({"host": "127.0.0.1", "port": args.api_port})
+    cfg.setdefault("provider", {})["base_url"] = f"http://127.0.0.1:{args.ollama_port}"
+    cfg.setdefault("search", {})["url"] = f"http://127.0.0.1:{args.searxng_port}"
+    cfg.setdefault("reranker", {})["enabled"] = False
+    cfg.setdefault("startup", {})["warmup"] = False
+    if args.provider_mode:
+        cfg["provider"]["mode"] = args.provider_mode
+
+    with open(cfg_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True, sort_keys=False)
+    return workdir
+
+def spawn(args):
+    workdir = prepare_workdir(args)
+    stub_cmd = [
+        sys.executable, os.path.join(ROOT, "benchmarks", "stub_servers.py"),
+        "--ollama-port", str(args.ollama_port), "--searxng-port", str(args.searxng_port),
+        "--prompt-eval-ms", str(args.prompt_eval_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+        "--search-ms", str(args.search_ms), "--page-ms", str(args.page_ms),
+    ]
+    log_file = open(os.path.join(workdir, "soulcore.out"), "w")
+    procs = [
+        subprocess.Popen(stub_cmd, cwd=workdir, stdout=log_file, stderr=subprocess.STDOUT),
+        subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir,
+                         stdout=log_file, stderr=subprocess.STDOUT),
+    ]
+    return workdir, procs, log_file
+
+def main():
+    parser = argparse.ArgumentParser(description="SoulCore terheléses benchmark")
+    parser.add_argument("--url", default=None, help="futó SoulCore példány (alap: a --spawn példány)")
+    parser.add_argument("--spawn", action="store_true", help="stub szerverek + SoulCore indítása")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--conversations", type=int, default=8, help="ennyi különböző chat_id között oszlik el")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--warmup", type=int, default=2, help="nem mért bemelegítő kérések")
+    parser.add_argument("--label", default="", help="szabad szöveges címke az eredményben")
+    parser.add_argument("--output", default=None, help="JSON eredményfájl")
+    stub = parser.add_argument_group("--spawn beállítások")
+    stub.add_argument("--api-port", type=int, default=18000)
+    stub.add_argument("--ollama-port", type=int, default=18434)
+    stub.add_argument("--searxng-port", type=int, default=18888)
+    stub.add_argument("--provider-mode", choices=["generate", "chat"], default=None)
+    stub.add_argument("--keep", action="store_true", help="a munkakönyvtár (DB, soulcore.out) megtartása")
+    stub.add_argument("--prompt-eval-ms", type=float, default=150.0)
+    stub.add_argument("--tokens-per-sec", type=float, default=40.0)
+    stub.add_argument("--search-ms", type=float, default=200.0)
+    stub.add_argument("--page-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    base_url = args.url or f"http://127.0.0.1:{args.api_port}"
+    workdir, procs, log_file = (None, [], None)
+    if args.spawn:
+        workdir, procs, log_file = spawn(args)
+        print(f"--- Stubok és SoulCore indítása ({workdir}) ---", flush=True)
+
+    try:
+        if not asyncio.run(wait_until_up(f"{base_url}/")):
+            print(f"A SoulCore nem indult el: {base_url}", file=sys.stderr)
+            sys.exit(1)
+        if args.warmup:
+            asyncio.run(run_load(base_url, 1, args.warmup, args.stream, 1, args.timeout))
+        report = asyncio.run(run_load(
+            base_url, args.concurrency, args.requests, args.stream, args.conversations, args.timeout
+        ))
+        report.update({
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "target": base_url,
+        })
+        if args.spawn:
+            report["stub"] = {
+                "prompt_eval_ms": args.prompt_eval_ms, "tokens_per_sec": args.tokens_per_sec,
+                "search_ms": args.search_ms, "page_ms": args.page_ms, "provider_mode": args.provider_mode,
+            }
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if log_file:
+            log_file.close()
+        if workdir:
+            if args.keep:
+                print(f"--- Munkakönyvtár megtartva: {workdir} ---", file=sys.stderr)
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
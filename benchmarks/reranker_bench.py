@@ -0,0 +1,97 @@
+"""Reranker backend benchmark: késleltetés és pontszám-egyezés a referencia
+(fp32 PyTorch, get_local_score) és egy CPU-optimalizált backend között.
+
+Futtatás a projekt gyökeréből:
+    python benchmarks/reranker_bench.py --mode int8
+    python benchmarks/reranker_bench.py --mode onnx --threads 4 --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+from core.reranker import Reranker
+from _stats import time_calls, summarize
+
+QUERY = "Ki Budapest jelenlegi főpolgármestere?"
+PASSAGES = [
+    "Budapest főpolgármestere Karácsony Gergely, akit 2019-ben választottak meg először, majd 2024-ben újraválasztották.",
+    "A Fővárosi Közgyűlés Budapest önkormányzatának képviselő-testülete, elnöke a főpolgármester.",
+    "Budapest Magyarország fővárosa, 1873-ban jött létre Pest, Buda és Óbuda egyesítésével.",
+    "A Duna Európa második leghosszabb folyója, Budapesten is keresztülfolyik.",
+    "A gulyásleves a magyar konyha egyik legismertebb étele, marhahúsból és paprikából készül.",
+    "Az ügyvezető (ügyv.) a cégjegyzékbe bejegyzett vezető tisztségviselő.",
+    "A helyrajzi szám (hrsz.) az ingatlan-nyilvántartásban az ingatlan egyedi azonosítója.",
+    "A Python egy általános célú programozási nyelv, amelyet Guido van Rossum tervezett.",
+]
+
+def spearman(a, b):
+    def ranks(xs):
+        order = sorted(range(len(xs)), key=lambda i: xs[i])
+        r = [0] * len(xs)
+        for rank, i in enumerate(order):
+            r[i] = rank
+        return r
+    ra, rb = ranks(a), ranks(b)
+    n = len(a)
+    d2 = sum((x - y) ** 2 for x, y in zip(ra, rb))
+    return 1 - 6 * d2 / (n * (n * n - 1)) if n > 1 else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Reranker backend benchmark")
+    parser.add_argument("--mode", choices=["int8", "onnx"], required=True)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op szálak (felülírja a configot)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--config", default=os.path.join("config", "main_config.yaml"))
+    parser.add_argument("--output", default=None, help="JSON eredményfájl")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        rerank_cfg = (yaml.safe_load(f) or {}).get("reranker", {})
+
+    base_cfg = dict(rerank_cfg, mode="local", device="cpu")
+    cand_cfg = dict(rerank_cfg, mode=args.mode)
+    if args.threads is not None:
+        cand_cfg["intra_op_threads"] = args.threads
+
+    baseline = Reranker(base_cfg)
+    candidate = Reranker(cand_cfg)
+
+    # Bemelegítés (lusta inicializálás, cache-ek)
+    baseline.get_local_score(QUERY, PASSAGES[0])
+    candidate.get_local_scores(QUERY, PASSAGES[:2])
+
+    base_scores, base_t = time_calls(lambda: [baseline.get_local_score(QUERY, p) for p in PASSAGES], args.repeat)
+    cand_single, cand_single_t = time_calls(lambda: [candidate.get_local_score(QUERY, p) for p in PASSAGES], args.repeat)
+    cand_batch, cand_batch_t = time_calls(lambda: candidate.get_local_scores(QUERY, PASSAGES), args.repeat)
+
+    diffs = [abs(a - b) for a, b in zip(base_scores, cand_batch)]
+    report = {
+        "mode": args.mode,
+        "intra_op_threads": cand_cfg.get("intra_op_threads", 0),
+        "passages": len(PASSAGES),
+        "baseline_fp32_sequential": summarize(base_t),
+        "candidate_sequential": summarize(cand_single_t),
+        "candidate_batch": summarize(cand_batch_t),
+        "speedup_batch_vs_baseline": round(statistics.mean(base_t) / statistics.mean(cand_batch_t), 2),
+        "agreement": {
+            "max_abs_diff": round(max(diffs), 4),
+            "mean_abs_diff": round(statistics.mean(diffs), 4),
+            "spearman": round(spearman(base_scores, cand_batch), 4),
+            "top1_match": max(range(len(PASSAGES)), key=lambda i: base_scores[i])
+                          == max(range(len(PASSAGES)), key=lambda i: cand_batch[i]),
+            "sequential_vs_batch_max_diff": round(max(abs(a - b) for a, b in zip(cand_single, cand_batch)), 4),
+        },
+    }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Scraper benchmark: HTML -> szöveg kinyerés a mentett oldalakon (benchmarks/fixtures/*.html).
+
+Összeveti a régi utat (BeautifulSoup + html.parser, a teljes oldal szövege) az elérhető
+backendekkel (selectolax / lxml / bs4), fő tartalom kiválasztással. A --concurrency
+a szálkészletes párhuzamos feldolgozást méri (így fut a scraper az event loopon kívül).
+
+Futtatás a projekt gyökeréből:
+    python benchmarks/scraper_bench.py
+    python benchmarks/scraper_bench.py --repeat 20 --concurrency 4 --output scraper.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from core.scraper import BACKENDS, extract_text
+from _stats import time_calls, summarize
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def legacy_extract(html, max_chars=3000):
+    """A korábbi scrape_url feldolgozása, változatlanul."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for s in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
+        s.decompose()
+    return soup.get_text(separator=' ', strip=True)[:max_chars]
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper szövegkinyerés benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-chars", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=4, help="párhuzamos feldolgozó szálak")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--output", default=None, help="JSON eredményfájl")
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    if not pages:
+        sys.exit(f"Nincs HTML fixture: {args.fixtures}")
+
+    extractors = {"legacy_bs4_html_parser": lambda html: legacy_extract(html, args.max_chars)}
+    for backend in BACKENDS:
+        extractors[backend] = lambda html, b=backend: extract_text(html, args.max_chars, backend=b)
+
+    report = {"backends": BACKENDS, "repeat": args.repeat, "pages": {}, "throughput": {}}
+    for name, html in pages.items():
+        page_report = {"bytes": len(html.encode("utf-8"))}
+        for label, fn in extractors.items():
+            fn(html)  # bemelegítés
+            text, timings = time_calls(lambda: fn(html), args.repeat)
+            page_report[label] = dict(summarize(timings), chars=len(text), preview=text[:80])
+        baseline = page_report["legacy_bs4_html_parser"]["mean_ms"]
+        page_report["speedup_vs_legacy"] = {
+            label: round(baseline / page_report[label]["mean_ms"], 2) for label in extractors if label in BACKENDS
+        }
+        report["pages"][name] = page_report
+
+    # Áteresztőképesség: az összes oldal feldolgozása párhuzamosan, szálkészletben
+    workload = list(pages.values()) * args.repeat
+    for label, fn in extractors.items():
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(fn, workload))
+            elapsed = time.perf_counter() - t0
+        report["throughput"][label] = {
+            "pages_per_s": round(len(workload) / elapsed, 1),
+            "concurrency": args.concurrency,
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Helyettesítő (stub) Ollama és SearXNG szerverek a GPU nélküli benchmarkokhoz.
+
+Az Ollama stub a /api/generate, /api/chat (stream és egyben), /api/embed,
+/api/embeddings és /api/tags végpontokat utánozza, állítható prompt-kiértékelési
+késleltetéssel és token/mp generálási sebességgel, valós formátumú statisztikákkal
+(prompt_eval_count, eval_count, *_duration, context). A SearXNG stub a
+/search?format=json végpontot adja, a találatok URL-jei a saját /page/{n} oldalaira
+mutatnak, így a scrape lépés is mérhető.
+
+Futtatás a projekt gyökeréből:
+    python benchmarks/stub_servers.py --ollama-port 11434 --searxng-port 8888 --tokens-per-sec 40
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+
+REPLY = ("Szia! Ez egy tesztválasz a benchmark stub szervertől, hogy a teljes pipeline "
+         "késleltetése GPU nélkül is mérhető legyen. <notepad>A felhasználó tesztel.</notepad>")
+PAGE_TEXT = ("Budapest Magyarország fővárosa és legnépesebb városa. "
+             "A város 1873-ban jött létre Pest, Buda és Óbuda egyesítésével. ") * 20
+
+def _tokenize(text: str) -> list:
+    """Durva token-darabolás (szó + szóköz), a stream ennyi darabban jön."""
+    words = text.split(" ")
+    return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def create_ollama_app(prompt_eval_ms=150.0, tokens_per_sec=40.0, load_ms=0.0, embed_ms=20.0,
+                      embed_dim=64, search_ratio=0.5, models=("gemma3:12B", "gemma3:4B")):
+    app = FastAPI(title="Ollama stub")
+    reply_tokens = _tokenize(REPLY)
+    token_delay = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+
+    def reply_for(prompt_text: str, system_text: str) -> list:
+        # A router és a RAG tisztító kérések rövid, determinisztikus választ kapnak
+        if "Search Decision Logic" in system_text:
+            seed = int(hashlib.md5(prompt_text.encode()).hexdigest(), 16) % 1000
+            return ["[SEARCH]" if seed < search_ratio * 1000 else "[INTERNAL]"]
+        if prompt_text.startswith("INPUT DATA:"):
+            return _tokenize(PAGE_TEXT[:400])
+        return reply_tokens
+
+    def stats(prompt_tokens: int, eval_tokens: int, with_context: bool) -> dict:
+        eval_ns = int(eval_tokens * token_delay * 1e9)
+        prompt_ns = int(prompt_eval_ms * 1e6)
+        load_ns = int(load_ms * 1e6)
+        data = {
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": prompt_ns,
+            "eval_count": eval_tokens,
+            "eval_duration": eval_ns,
+            "load_duration": load_ns,
+            "total_duration": load_ns + prompt_ns + eval_ns,
+        }
+        if with_context:
+            data["context"] = list(range(prompt_tokens + eval_tokens))
+        return data
+
+    async def generate(body: dict, chat: bool):
+        if chat:
+            messages = body.get("messages", [])
+            system_text = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+            prompt_text = messages[-1].get("content", "") if messages else ""
+            full_text = "".join(m.get("content", "") for m in messages)
+        else:
+            system_text = body.get("system", "")
+            prompt_text = body.get("prompt", "")
+            full_text = system_text + prompt_text
+            # A Gemma sablonban a system prompt a prompt része
+            if "Search Decision Logic" in prompt_text:
+                system_text = prompt_text
+            marker = "INPUT DATA:"
+            if marker in prompt_text:
+                prompt_text = prompt_text[prompt_text.index(marker):]
+
+        tokens = reply_for(prompt_text, system_text)
+        prompt_tokens = _estimate_tokens(full_text)
+        model = body.get("model", models[0])
+
+        def chunk(text: str) -> dict:
+            if chat:
+                return {"model": model, "message": {"role": "assistant", "content": text}, "done": False}
+            return {"model": model, "response": text, "done": False}
+
+        final = dict(stats(prompt_tokens, len(tokens), with_context=not chat), model=model)
+
+        if not body.get("stream", True):
+            await asyncio.sleep((load_ms + prompt_eval_ms) / 1000 + token_delay * len(tokens))
+            data = chunk("".join(tokens))
+            data.update(final)
+            return JSONResponse(data)
+
+        async def ndjson():
+            await asyncio.sleep((load_ms + prompt_eval_ms) / 1000)
+            for token in tokens:
+                yield json.dumps(chunk(token), ensure_ascii=False) + "\n"
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+            final_chunk = chunk("")
+            final_chunk.update(final)
+            yield json.dumps(final_chunk) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    def vector(text: str) -> list:
+        rnd = random.Random(hashlib.md5(text.encode()).hexdigest())
+        return [rnd.uniform(-1, 1) for _ in range(embed_dim)]
+
+    @app.post("/api/generate")
+    async def api_generate(request: Request):
+        return await generate(await request.json(), chat=False)
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        return await generate(await request.json(), chat=True)
+
+    @app.post("/api/embed")
+    async def api_embed(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        await asyncio.sleep(embed_ms / 1000)
+        return {"model": body.get("model"), "embeddings": [vector(t) for t in texts]}
+
+    @app.post("/api/embeddings")
+    async def api_embeddings(request: Request):
+        body = await request.json()
+        await asyncio.sleep(embed_ms / 1000)
+        return {"embedding": vector(body.get("prompt", ""))}
+
+    @app.get("/api/tags")
+    async def api_tags():
+        return {"models": [{"name": m, "model": m, "size": 0, "details": {}} for m in models]}
+
+    return app
+
+def create_searxng_app(search_ms=200.0, page_ms=150.0, results=5, public_url="http://127.0.0.1:8888"):
+    app = FastAPI(title="SearXNG stub")
+
+    @app.get("/search")
+    async def search(q: str = "", format: str = "json"):
+        await asyncio.sleep(search_ms / 1000)
+        return {
+            "query": q,
+            "results": [
+                {"title": f"{q} - találat {i}", "url": f"{public_url}/page/{i}?q={urllib.parse.quote_plus(q)}",
+                 "content": f"Rövid kivonat a(z) {i}. találatból: {q}."}
+                for i in range(results)
+            ],
+        }
+
+    @app.get("/page/{n}")
+    async def page(n: int, q: str = ""):
+        await asyncio.sleep(page_ms / 1000)
+        return HTMLResponse(
+            f"<html><head><style>body{{}}</style></head><body><nav>menü</nav>"
+            f"<h1>{q} ({n})</h1><p>{PAGE_TEXT}</p><footer>lábléc</footer></body></html>"
+        )
+
+    return app
+
+async def serve(args):
+    ollama = create_ollama_app(
+        prompt_eval_ms=args.prompt_eval_ms, tokens_per_sec=args.tokens_per_sec, load_ms=args.load_ms,
+        embed_ms=args.embed_ms, search_ratio=args.search_ratio,
+    )
+    searxng = create_searxng_app(
+        search_ms=args.search_ms, page_ms=args.page_ms, results=args.results,
+        public_url=f"http://{args.host}:{args.searxng_port}",
+    )
+    servers = [
+        uvicorn.Server(uvicorn.Config(ollama, host=args.host, port=args.ollama_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(searxng, host=args.host, port=args.searxng_port, log_level="warning")),
+    ]
+    print(f"--- Stub szerverek: Ollama :{args.ollama_port}, SearXNG :{args.searxng_port} ---", flush=True)
+    await asyncio.gather(*(s.serve() for s in servers))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ollama + SearXNG stub szerverek")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--searxng-port", type=int, default=8888)
+    parser.add_argument("--prompt-eval-ms", type=float, default=150.0, help="prompt kiértékelés (első tokenig)")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="generálási sebesség")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="modell betöltési idő kérésenként")
+    parser.add_argument("--embed-ms", type=float, default=20.0)
+    parser.add_argument("--search-ratio", type=float, default=0.5, help="a router kérések ekkora része [SEARCH]")
+    parser.add_argument("--search-ms", type=float, default=200.0)
+    parser.add_argument("--page-ms", type=float, default=150.0)
+    parser.add_argument("--results", type=int, default=5)
+    return parser
+
+if __name__ == "__main__":
+    asyncio.run(serve(build_parser().parse_args()))
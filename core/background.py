@@ -0,0 +1,46 @@
+import asyncio
+from core.logger import get_logger
+
+log = get_logger("background")
+
+class BackgroundTasks:
+    """Nyilvántartott háttérfeladatok (fire-and-forget), hogy leálláskor le lehessen őket zárni.
+
+    spawn(coro): a feladat elindítása és megjegyzése (a kész feladat magától kikerül).
+    drain(grace): leálláskor legfeljebb grace másodpercig hagyjuk befejeződni őket
+    (pl. a függő írásokat), a maradékot megszakítjuk, és megvárjuk a leállásukat.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"Háttérfeladat hiba ({self.name}): {task.exception()}")
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def drain(self, grace: float = 5.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + grace
+        # Ciklusban: a befejeződő feladatok újakat indíthatnak (pl. utófeldolgozás -> indexelés)
+        while self._tasks:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+        pending = set(self._tasks)
+        if pending:
+            log.warning(f"{len(pending)} háttérfeladat megszakítva leálláskor ({self.name}).")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
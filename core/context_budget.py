@@ -0,0 +1,141 @@
+import re
+import threading
+from core.logger import get_logger
+
+log = get_logger("context_budget")
+
+class TokenCounter:
+    """Tokenszámláló: a modell HF tokenizere, ha be van állítva, különben gyors becslés.
+
+    A becslés karakter/token aránnyal dolgozik (magyar szövegre ~3.5 jól közelít);
+    a tokenizert lustán, első használatkor töltjük be, hiba esetén marad a becslés.
+    """
+
+    def __init__(self, tokenizer_name: str = None, chars_per_token: float = 3.5):
+        self.tokenizer_name = tokenizer_name
+        self.chars_per_token = chars_per_token
+        self._tokenizer = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _get_tokenizer(self):
+        if not self.tokenizer_name or self._failed:
+            return None
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None and not self._failed:
+                    try:
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                        log.info(f"Tokenizer betöltve: {self.tokenizer_name}")
+                    except Exception as e:
+                        self._failed = True
+                        log.warning(f"Tokenizer nem elérhető ({self.tokenizer_name}), becslés marad: {e}")
+        return self._tokenizer
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+        return int(len(text) / self.chars_per_token) + 1
+
+class ContextBudget:
+    """Szakaszonkénti token-keret a végső prompthoz (persona, RAG, memóriák, jegyzetek, előzmény).
+
+    Először minden szakasz a saját keretére vágódik; ha az összeg így is túllépi a
+    teljes keretet, a prioritási lista végéről indulva szűkítjük a szakaszokat.
+    """
+
+    def __init__(self, config: dict):
+        budget_cfg = config.get("context_budget", {})
+        self.counter = TokenCounter(
+            tokenizer_name=budget_cfg.get("tokenizer"),
+            chars_per_token=budget_cfg.get("chars_per_token", 3.5),
+        )
+        self.total_tokens = budget_cfg.get("total_tokens", 6000)
+        self.limits = {
+            "rag": config.get("rag", {}).get("max_context_length", 2000),
+            "rag_input": budget_cfg.get("rag_input_tokens", 3000),
+            "memories": config.get("memory", {}).get("token_budget", 400),
+            "notes": budget_cfg.get("notes_tokens", 600),
+            "history": config.get("provider", {}).get("history_tokens", 2048),
+        }
+        # Elöl a legfontosabb: a lista végéről vágunk először
+        self.priority = budget_cfg.get("priority", ["rag", "memories", "notes", "history"])
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def limit(self, section: str) -> int:
+        return self.limits.get(section, self.total_tokens)
+
+    def fit_text(self, text: str, max_tokens: int) -> str:
+        """Szöveg vágása a keretre, lehetőleg mondat- vagy szóhatáron."""
+        if not text or self.count(text) <= max_tokens:
+            return text or ""
+        if max_tokens <= 0:
+            return ""
+        # Karakterarányos első közelítés, majd finomítás lefelé
+        cut = int(len(text) * max_tokens / self.count(text))
+        candidate = text[:cut]
+        while candidate and self.count(candidate) > max_tokens:
+            candidate = candidate[:int(len(candidate) * 0.9)]
+        boundary = max(candidate.rfind(". "), candidate.rfind("\n"))
+        if boundary > len(candidate) * 0.6:
+            candidate = candidate[:boundary + 1]
+        else:
+            candidate = re.sub(r"\s+\S*$", "", candidate)
+        return candidate.rstrip() + " […]"
+
+    def fit_items(self, items: list, max_tokens: int, keep: str = "first") -> list:
+        """Lista elemeinek megtartása a keretig. keep='first': elölről (rangsorolt találatok),
+        keep='last': hátulról (a legfrissebb jegyzetek/üzenetek maradnak)."""
+        ordered = items if keep == "first" else list(reversed(items))
+        kept, used = [], 0
+        for item in ordered:
+            cost = self.count(item if isinstance(item, str) else item.get("content", ""))
+            if used + cost > max_tokens:
+                break
+            kept.append(item)
+            used += cost
+        return kept if keep == "first" else kept[::-1]
+
+    def _section_cost(self, value) -> int:
+        if isinstance(value, str):
+            return self.count(value)
+        return sum(self.count(v if isinstance(v, str) else v.get("content", "")) for v in value)
+
+    def allocate(self, fixed_tokens: int, sections: dict) -> dict:
+        """sections: {név: szöveg vagy lista}. Visszaadja a keretre vágott szakaszokat.
+
+        fixed_tokens: a nem vágható részek (persona, szabályok, felhasználói üzenet) mérete.
+        """
+        keep_mode = {"history": "last"}  # az előzményből a legfrissebb marad
+        fitted = {}
+        for name, value in sections.items():
+            if isinstance(value, str):
+                fitted[name] = self.fit_text(value, self.limit(name))
+            else:
+                fitted[name] = self.fit_items(list(value or []), self.limit(name), keep_mode.get(name, "first"))
+
+        overflow = fixed_tokens + sum(self._section_cost(v) for v in fitted.values()) - self.total_tokens
+        for name in reversed(self.priority):
+            if overflow <= 0:
+                break
+            if name not in fitted:
+                continue
+            current = self._section_cost(fitted[name])
+            target = max(0, current - overflow)
+            if isinstance(fitted[name], str):
+                fitted[name] = self.fit_text(fitted[name], target)
+            else:
+                fitted[name] = self.fit_items(fitted[name], target, keep_mode.get(name, "first"))
+            remaining = self._section_cost(fitted[name])
+            overflow -= current - remaining
+            log.info(f"Prompt keret túllépés: '{name}' szakasz {current} -> {remaining} token")
+
+        if overflow > 0:
+            log.warning(f"A prompt a vágások után is {overflow} tokennel a keret fölött van.")
+        return fitted
@@ -1,29 +1,164 @@
 import sqlite3
 import json
+import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from core.logger import get_logger
+from core.migrations import MIGRATIONS, OPTIONAL_MIGRATIONS
+from core.vector_store import memory_indexer
+
+# Szálanként egy tartós kapcsolat adatbázis-fájlonként. Modulszintű, hogy a
+# több helyen példányosított DBManager-ek (kernel, discovery, search) osztozzanak rajta.
+_thread_state = threading.local()
+_all_connections = []  # (tulajdonos szál, kapcsolat)
+_all_connections_lock = threading.Lock()
+_generation = 0  # close_all() után növeljük, így a többi szál is új kapcsolatot nyit
+
+# Gyakori magyar esetragok (leghosszabb elöl), a tény-keresés prefix-tövéhez
+_HU_SUFFIXES = sorted([
+    "ként", "ból", "ből", "ról", "ről", "tól", "től", "ban", "ben", "nak", "nek", "hoz", "hez", "höz",
+    "nál", "nél", "val", "vel", "ért", "ba", "be", "ra", "re", "on", "en", "ön", "ig", "ul", "ül",
+], key=len, reverse=True)
+_MIN_STEM = 4
+
+def _stem(word: str) -> str:
+    """Ismert rag levágása (ha legalább _MIN_STEM hosszú tő marad); egyébként a hosszú
+    szavak utolsó két betűje (ismeretlen toldalék), a rövideké változatlan."""
+    for suffix in _HU_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[:-len(suffix)]
+    return word[:-2] if len(word) > 6 else word
 
 class DBManager:
+    # Kapcsolat-hangolás (WAL: az olvasók nem blokkolják az írót és fordítva)
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-16000",
+    )
+    STATEMENT_CACHE_SIZE = 256
+
     def __init__(self, db_path="soulcore.db"):
         self.db_path = db_path
         self.log = get_logger("db_manager")
         self._init_db()
 
+    def _get_conn(self):
+        """Az aktuális szál tartós kapcsolata (első használatkor nyitjuk meg)."""
+        conns = getattr(_thread_state, "conns", None)
+        if conns is not None and _thread_state.generation != _generation:
+            # close_all() óta: a szál a saját régi kapcsolatait maga zárja le
+            with _all_connections_lock:
+                _all_connections[:] = [(t, c) for t, c in _all_connections if c not in conns.values()]
+            for old in conns.values():
+                try:
+                    old.close()
+                except Exception:
+                    pass
+            conns = None
+        if conns is None:
+            conns = _thread_state.conns = {}
+            _thread_state.tx_depth = {}
+            _thread_state.generation = _generation
+
+        conn = conns.get(self.db_path)
+        if conn is None:
+            # isolation_level=None: autocommit, a tranzakciókat a transaction() kezeli explicit módon
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=5.0,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.STATEMENT_CACHE_SIZE,
+            )
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            conns[self.db_path] = conn
+            with _all_connections_lock:
+                _all_connections.append((threading.current_thread(), conn))
+        return conn
+
+    def _tx_depth(self):
+        self._get_conn()
+        return _thread_state.tx_depth.get(self.db_path, 0)
+
+    @contextmanager
+    def transaction(self):
+        """Explicit tranzakció: a blokkban futó összes _execute egyetlen commitban zárul.
+
+        Egymásba ágyazható (csak a legkülső szint commitol). A blokkon belül az SQL
+        hibák nem nyelődnek el, hanem kivételként jönnek ki, és az egész visszagörgetődik.
+        """
+        conn = self._get_conn()
+        depth = _thread_state.tx_depth.get(self.db_path, 0)
+        _thread_state.tx_depth[self.db_path] = depth + 1
+        try:
+            if depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            yield self
+            if depth == 0:
+                conn.execute("COMMIT")
+        except Exception:
+            if depth == 0 and conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            _thread_state.tx_depth[self.db_path] = depth
+
     def _execute(self, query, params=(), commit=False, fetch_all=False):
-        """Központi SQL végrehajtó. Biztosítja a szálbiztos lezárást."""
+        """Központi SQL végrehajtó a szál tartós kapcsolatán.
+
+        Tranzakción kívül minden utasítás azonnal véglegesül (autocommit), így a
+        'commit' paraméter csak a régi hívók kompatibilitása miatt maradt meg.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                if commit:
-                    conn.commit()
-                if fetch_all:
-                    return cursor.fetchall()
-                return cursor.fetchone()
+            cursor = self._get_conn().execute(query, params)
+            if fetch_all:
+                return cursor.fetchall()
+            return cursor.fetchone()
         except Exception as e:
+            if self._tx_depth() > 0:
+                raise
             self.log.error(f"SQL Hiba: {e} | Query: {query[:50]}...")
             return None
 
+    def execute_many(self, query, seq_of_params):
+        """Ugyanaz az utasítás sok paraméterkészlettel, egyetlen commitban."""
+        try:
+            with self.transaction():
+                self._get_conn().executemany(query, seq_of_params)
+            return True
+        except Exception as e:
+            self.log.error(f"SQL Batch Hiba: {e} | Query: {query[:50]}...")
+            return False
+
+    @staticmethod
+    def close_all():
+        """A tartós kapcsolatok lezárása (leálláskor).
+
+        Csak a hívó szál és a már leállt szálak kapcsolatait zárjuk itt: egy még élő szál
+        (pl. to_thread worker) éppen használhatja a sajátját. Azokat a tulajdonos szál zárja
+        le a következő _get_conn hívásakor, vagy a folyamat végén szűnnek meg.
+        """
+        global _generation
+        current = threading.current_thread()
+        with _all_connections_lock:
+            remaining = []
+            for owner, conn in _all_connections:
+                if owner is current or not owner.is_alive():
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                else:
+                    remaining.append((owner, conn))
+            _all_connections[:] = remaining
+            _generation += 1
+
     def _init_db(self):
         """Minden tábla inicializálása - Origó központosított sémája."""
         tables = [
@@ -111,8 +246,14 @@ class DBManager:
             )"""
         ]
 
-        for table_sql in tables:
-            self._execute(table_sql, commit=True)
+        try:
+            with self.transaction():
+                for table_sql in tables:
+                    self._execute(table_sql)
+        except Exception as e:
+            self.log.error(f"Séma inicializálási hiba: {e}")
+
+        self._run_migrations()
 
         # --- FREEDOM MODE FIX ---
         # Ellenőrizzük, hogy létezik-e a bejegyzés. Ha nem, beszúrjuk.
@@ -126,6 +267,40 @@ class DBManager:
         
         self.log.info("SoulCore adatbázis sémák ellenőrizve.")
 
+    def _run_migrations(self):
+        """A még nem alkalmazott migrációk lefuttatása sorrendben (helyben frissíti a régi DB-t)."""
+        self._execute("""CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""")
+        # Nem MAX(version): egy kimaradt opcionális migráció később még pótolható
+        applied = {r[0] for r in self._execute("SELECT version FROM schema_version", fetch_all=True) or []}
+
+        for version, description, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            try:
+                # Minden migráció atomikus: vagy teljesen lefut a verzióbejegyzéssel együtt, vagy semmi
+                with self.transaction():
+                    for sql in statements:
+                        self._execute(sql)
+                    self._execute(
+                        "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                        (version, description)
+                    )
+                self.log.info(f"Migráció alkalmazva: v{version} - {description}")
+                applied.add(version)
+            except Exception as e:
+                if version in OPTIONAL_MIGRATIONS:
+                    self.log.warning(f"Opcionális migráció kihagyva (v{version} - {description}): {e}")
+                    continue
+                # A későbbiek építhetnek erre, ezért itt megállunk
+                self.log.error(f"Migrációs hiba (v{version}): {e}")
+                break
+        # FTS5 nélkül (kimaradt v2) a tény-keresés LIKE-ra esik vissza
+        self.fts_enabled = 2 in applied
+
     # --- KÉNYELMI FUNKCIÓK A TESZTELÉSHEZ ---
 
     def toggle_freedom_mode(self, state: bool):
@@ -166,12 +341,25 @@ class DBManager:
         return self._execute(query, (model_name, limit), fetch_all=True)
 
     def get_notes_for_conversation(self, conv_id):
-        query = "SELECT topic_tag, content FROM short_term_notes WHERE conv_id = ?"
+        # Determinisztikus sorrend, hogy a prompt ne változzon feleslegesen hívásról hívásra
+        query = "SELECT topic_tag, content FROM short_term_notes WHERE conv_id = ? ORDER BY created_at, id"
         return self._execute(query, (conv_id,), fetch_all=True)
 
     def clear_short_term_memory(self, conv_id):
         return self._execute("DELETE FROM short_term_notes WHERE conv_id = ?", (conv_id,), commit=True)
 
+    # --- BESZÉLGETÉS ELŐZMÉNYEK (/api/chat mód) ---
+
+    def add_message(self, chat_id, role, content):
+        query = "INSERT INTO message (chat_id, role, content) VALUES (?, ?, ?)"
+        return self._execute(query, (chat_id, role, content), commit=True)
+
+    def get_recent_messages(self, chat_id, limit=50):
+        """A legutóbbi 'limit' üzenet időrendben: [(role, content), ...]."""
+        query = "SELECT role, content FROM message WHERE chat_id = ? ORDER BY id DESC LIMIT ?"
+        rows = self._execute(query, (chat_id, limit), fetch_all=True) or []
+        return rows[::-1]
+
     # --- HOSSZÚTÁVÚ MEMÓRIA (LONG TERM) ---
 
     def get_long_term_memories(self, subject=None):
@@ -180,6 +368,58 @@ class DBManager:
             return self._execute(query, (f"%{subject}%",), fetch_all=True)
         return self._execute("SELECT subject, predicate, object_detail FROM long_term_memory", fetch_all=True)
 
+    def search_long_term_memories(self, text, limit=8):
+        """A szöveghez legrelevánsabb tények BM25 rangsor szerint (FTS5).
+
+        A magyar ragozás miatt a szavakat a ragjuk nélkül, prefixként keressük
+        (pl. 'Debrecenben' -> 'debrecen*'). FTS hiba esetén üres listát ad; FTS5 nélküli
+        SQLite-on LIKE keresés (rangsor nélkül, megbízhatóság szerint).
+        """
+        stems = []
+        for word in re.findall(r"\w{3,}", text.lower()):
+            stem = _stem(word)
+            if stem not in stems:
+                stems.append(stem)
+        if not stems:
+            return []
+        if not getattr(self, "fts_enabled", True):
+            return self._search_long_term_memories_like(stems[:8], limit)
+        terms = [f'"{stem}"*' for stem in stems]
+
+        query = """
+            SELECT m.subject, m.predicate, m.object_detail
+            FROM long_term_memory_fts f
+            JOIN long_term_memory m ON m.id = f.rowid
+            WHERE long_term_memory_fts MATCH ?
+            ORDER BY bm25(long_term_memory_fts, 3.0, 1.0, 1.0), m.reliability_index DESC
+            LIMIT ?
+        """
+        return self._execute(query, (" OR ".join(terms), limit), fetch_all=True) or []
+
+    def _search_long_term_memories_like(self, stems, limit):
+        clause = " OR ".join(["(subject LIKE ? OR predicate LIKE ? OR object_detail LIKE ?)"] * len(stems))
+        params = [f"%{stem}%" for stem in stems for _ in range(3)]
+        query = f"""
+            SELECT subject, predicate, object_detail FROM long_term_memory
+            WHERE {clause} ORDER BY reliability_index DESC LIMIT ?
+        """
+        return self._execute(query, (*params, limit), fetch_all=True) or []
+
+    def get_long_term_facts(self):
+        """Az összes tény azonosítóval: (id, subject, predicate, object_detail) - a vektor index pótlásához."""
+        return self._execute("SELECT id, subject, predicate, object_detail FROM long_term_memory", fetch_all=True) or []
+
+    def add_long_term_memory(self, subject, predicate, object_detail, reliability=1.0, source_conv_id=None):
+        """Új tény; a vektor indexbe is bekerül (háttérben, az event loopon)."""
+        query = """
+            INSERT INTO long_term_memory (subject, predicate, object_detail, reliability_index, source_conv_id)
+            VALUES (?, ?, ?, ?, ?) RETURNING id
+        """
+        res = self._execute(query, (subject, predicate, object_detail, reliability, source_conv_id), commit=True)
+        if res:
+            memory_indexer.schedule("fact", res[0], f"{subject} {predicate or ''} {object_detail or ''}".strip())
+        return res
+
     # --- ENTITÁS MEMÓRIA (A Scribe használja) ---
 
     def update_entity_memory(self, entity_type, key_name, value):
@@ -205,34 +445,163 @@ class DBManager:
         """
         return self._execute(query, (model, protocol, content, priority, vram), commit=True)
 
+    # --- EMBEDDING CACHE ---
+
+    def get_cached_embeddings(self, model, text_hashes):
+        """{text_hash: (dim, blob)} a már ismert embeddingekhez."""
+        found = {}
+        hashes = list(text_hashes)
+        # A SQLite paraméterlimitje miatt darabokban kérdezünk
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            query = f"SELECT text_hash, dim, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})"
+            for text_hash, dim, blob in self._execute(query, (model, *chunk), fetch_all=True) or []:
+                found[text_hash] = (dim, blob)
+        return found
+
+    def save_embeddings(self, model, rows):
+        """rows: [(text_hash, dim, blob), ...] - egyetlen commitban."""
+        query = "INSERT OR REPLACE INTO embedding_cache (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)"
+        return self.execute_many(query, [(model, h, dim, blob) for h, dim, blob in rows])
+
     # --- EGYÉB FUNKCIÓK ---
 
     def update_ollama_model(self, tag, size):
         query = "INSERT OR REPLACE INTO ollama_models (tag, size_bytes, last_seen) VALUES (?, ?, datetime('now'))"
         return self._execute(query, (tag, size), commit=True)
 
-    def save_search_to_cache(self, query_hash, raw_query, results_json, hours=12):
+    def save_search_to_cache(self, query_hash, raw_query, results_json, hours=12, ttl_seconds=None):
         query = """
             INSERT OR REPLACE INTO search_cache (query_hash, raw_query, results_json, expires_at)
             VALUES (?, ?, ?, datetime('now', ?))
         """
-        return self._execute(query, (query_hash, raw_query, results_json, f'+{hours} hours'), commit=True)
+        ttl_seconds = int(ttl_seconds if ttl_seconds is not None else hours * 3600)
+        return self._execute(query, (query_hash, raw_query, results_json, f'+{ttl_seconds} seconds'), commit=True)
 
     def get_cached_search(self, query_hash):
         query = "SELECT results_json FROM search_cache WHERE query_hash = ? AND expires_at > datetime('now')"
         res = self._execute(query, (query_hash,))
         return json.loads(res[0]) if res else None
+
+    def get_cached_search_entry(self, query_hash):
+        """(results_json, lejáratig hátralévő mp) - a már lejárt sorokat is visszaadja (negatív érték)."""
+        query = """
+            SELECT results_json, (julianday(expires_at) - julianday('now')) * 86400
+            FROM search_cache WHERE query_hash = ?
+        """
+        return self._execute(query, (query_hash,))
+
+    def purge_expired_search_cache(self, grace_seconds=0):
+        """A türelmi időn túl lejárt sorok törlése (az expires_at indexen); törölt sorok száma."""
+        query = "DELETE FROM search_cache WHERE expires_at < datetime('now', ?)"
+        try:
+            return self._get_conn().execute(query, (f'-{int(grace_seconds)} seconds',)).rowcount
+        except Exception as e:
+            self.log.error(f"SQL Hiba: {e} | Query: {query[:50]}...")
+            return 0
         
-    def get_next_pending_task(self):
-        #Lekéri a következő végrehajtandó feladatot a hozzá tartozó chat_id-val.
+    # --- OLDALTÁR (scrape) ---
+
+    def get_scraped_page(self, url):
+        """(etag, last_modified, content_hash, kor mp-ben, szöveg) vagy None."""
+        query = """
+            SELECT p.etag, p.last_modified, p.content_hash,
+                   (julianday('now') - julianday(p.fetched_at)) * 86400, c.text
+            FROM scraped_pages p LEFT JOIN page_content c ON c.content_hash = p.content_hash
+            WHERE p.url = ?
+        """
+        return self._execute(query, (url,))
+
+    def get_page_text(self, content_hash):
+        res = self._execute("SELECT text FROM page_content WHERE content_hash = ?", (content_hash,))
+        return res[0] if res else None
+
+    def save_scraped_page(self, url, etag, last_modified, content_hash, text):
+        """Az oldal (URL) és a tartalma egy tranzakcióban; azonos hash-ű tartalom csak egyszer tárolódik."""
+        try:
+            with self.transaction():
+                self._execute(
+                    "INSERT OR IGNORE INTO page_content (content_hash, text) VALUES (?, ?)",
+                    (content_hash, text)
+                )
+                self._execute("""
+                    INSERT OR REPLACE INTO scraped_pages (url, etag, last_modified, content_hash, fetched_at)
+                    VALUES (?, ?, ?, ?, datetime('now'))
+                """, (url, etag, last_modified, content_hash))
+            return True
+        except Exception as e:
+            if self._tx_depth() > 0:
+                raise
+            self.log.error(f"SQL Hiba (save_scraped_page): {e}")
+            return False
+
+    def touch_scraped_page(self, url, etag=None, last_modified=None):
+        """304 Not Modified után: a letöltés ideje frissül, az új validátorok (ha jöttek) felülírják a régit."""
+        query = """
+            UPDATE scraped_pages SET fetched_at = datetime('now'),
+                   etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+            WHERE url = ?
+        """
+        return self._execute(query, (etag, last_modified, url))
+
+    def purge_scraped_pages(self, max_age_seconds):
+        """A régóta nem frissített oldalak és a már sehonnan nem hivatkozott tartalmak törlése."""
+        try:
+            with self.transaction():
+                conn = self._get_conn()
+                pages = conn.execute(
+                    "DELETE FROM scraped_pages WHERE fetched_at < datetime('now', ?)",
+                    (f'-{int(max_age_seconds)} seconds',)
+                ).rowcount
+                conn.execute("""
+                    DELETE FROM page_content WHERE NOT EXISTS
+                        (SELECT 1 FROM scraped_pages p WHERE p.content_hash = page_content.content_hash)
+                """)
+            return pages
+        except Exception as e:
+            if self._tx_depth() > 0:
+                raise
+            self.log.error(f"SQL Hiba (purge_scraped_pages): {e}")
+            return 0
+
+    def add_task(self, chat_id, description, priority=1, scheduled_for=None):
+        """Új 'pending' feladat; visszaadja az azonosítóját (hiba esetén None)."""
         query = """
-            SELECT id, chat_id, task_description, priority 
-            FROM task_scheduler 
-            WHERE status = 'pending' 
-            AND (scheduled_for <= datetime('now', 'localtime') OR scheduled_for IS NULL)
-            ORDER BY priority DESC LIMIT 1
+            INSERT INTO task_scheduler (chat_id, task_description, priority, status, scheduled_for)
+            VALUES (?, ?, ?, 'pending', ?)
         """
-        return self._execute(query)
+        try:
+            return self._get_conn().execute(query, (chat_id, description, priority, scheduled_for)).lastrowid
+        except Exception as e:
+            if self._tx_depth() > 0:
+                raise
+            self.log.error(f"SQL Hiba: {e} | Query: {query[:50]}...")
+            return None
+
+    def get_pending_tasks(self):
+        """Minden várakozó feladat az ütemező betöltéséhez: [(id, scheduled_for, priority), ...]."""
+        query = "SELECT id, scheduled_for, priority FROM task_scheduler WHERE status = 'pending'"
+        return self._execute(query, fetch_all=True) or []
+
+    def get_task(self, task_id):
+        query = "SELECT id, chat_id, task_description, priority FROM task_scheduler WHERE id = ?"
+        return self._execute(query, (task_id,))
+
+    def claim_task(self, task_id) -> bool:
+        """Atomikus lefoglalás: csak az a folyamat/worker kapja meg, amelyiknek az UPDATE
+        ténylegesen átállította 'pending' -> 'running' állapotba (rowcount == 1)."""
+        query = "UPDATE task_scheduler SET status = 'running' WHERE id = ? AND status = 'pending'"
+        try:
+            return self._get_conn().execute(query, (task_id,)).rowcount == 1
+        except Exception as e:
+            self.log.error(f"SQL Hiba: {e} | Query: {query[:50]}...")
+            return False
+
+    def reschedule_task(self, task_id, scheduled_for):
+        """Visszaállítás 'pending' állapotba egy későbbi időponttal (pl. foglalt modell miatt)."""
+        query = "UPDATE task_scheduler SET status = 'pending', scheduled_for = ? WHERE id = ?"
+        return self._execute(query, (scheduled_for, task_id), commit=True)
 
     def update_task_status(self, task_id, status):
         """Feladat állapotának frissítése (running, completed, failed)."""
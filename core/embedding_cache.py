@@ -0,0 +1,51 @@
+import hashlib
+import asyncio
+import numpy as np
+from core.logger import get_logger
+
+log = get_logger("embedding_cache")
+
+class EmbeddingCache:
+    """Lemezes embedding cache (model, sha256(szöveg)) kulccsal a soulcore.db-ben.
+
+    Az azonos tartalom újra-embeddelése így nem kerül hálózati hívásba.
+    A DBManager-t lustán hozzuk létre, hogy az importálás ne nyúljon az adatbázishoz.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import DBManager
+            self._db = DBManager()
+        return self._db
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def get_many(self, model: str, texts: list) -> dict:
+        """{text_hash: vektor (list)} a cache-ben már meglévő szövegekhez."""
+        hashes = {self.text_hash(t) for t in texts}
+        try:
+            rows = await asyncio.to_thread(self.db.get_cached_embeddings, model, hashes)
+        except Exception as e:
+            log.error(f"Embedding cache olvasási hiba: {e}")
+            return {}
+        return {h: np.frombuffer(blob, dtype=np.float32, count=dim).tolist() for h, (dim, blob) in rows.items()}
+
+    async def put_many(self, model: str, pairs: list):
+        """pairs: [(szöveg, vektor), ...]"""
+        rows = []
+        for text, vector in pairs:
+            vec = np.asarray(vector, dtype=np.float32)
+            rows.append((self.text_hash(text), int(vec.shape[0]), vec.tobytes()))
+        if rows:
+            try:
+                await asyncio.to_thread(self.db.save_embeddings, model, rows)
+            except Exception as e:
+                log.error(f"Embedding cache írási hiba: {e}")
+
+embedding_cache = EmbeddingCache()
@@ -1,15 +1,30 @@
 import time
+import heapq
 import asyncio
 import sqlite3
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from core.ollama_core import ollama_generate
+from core.llm_scheduler import LLMDeadlineExceeded, LLMPreempted
 from core.logger import get_logger
+from core.write_queue import write_queue
+from core.background import BackgroundTasks
 
 log = get_logger("heartbeat")
 
+def _due_timestamp(scheduled_for) -> float:
+    """A scheduled_for (helyi idő, 'YYYY-MM-DD HH:MM:SS') epoch másodpercként; hiányzó
+    vagy értelmezhetetlen érték esetén azonnal esedékes."""
+    if not scheduled_for:
+        return time.time()
+    try:
+        return datetime.fromisoformat(str(scheduled_for).strip()).timestamp()
+    except ValueError:
+        log.warning(f"Értelmezhetetlen időpont ({scheduled_for}), azonnal esedékes.")
+        return time.time()
+
 class Heartbeat:
-    def __init__(self, db_manager, kernel=None):
+    def __init__(self, db_manager, kernel=None, config=None):
         self.db = db_manager
         self.kernel = kernel
         self.sentry_model = "gemma3:270m"
@@ -19,6 +34,21 @@ class Heartbeat:
         self.protocol = "SOUL-LINK-v1"
         self.webui_db_path = "/var/lib/docker/volumes/open-webui/_data/webui.db" 
 
+        hb_cfg = config or {}
+        self.workers = hb_cfg.get("workers", 3)
+        self.resync_seconds = hb_cfg.get("resync_seconds", 60)
+        self.reflection_seconds = hb_cfg.get("reflection_seconds", 300)
+        self.retry_seconds = hb_cfg.get("retry_seconds", 120)
+        self.max_retries = hb_cfg.get("max_retries", 5)
+        self._retries = {}  # task_id -> eddigi halasztások
+        # Időzítő kupac: (esedékesség, -prioritás, task_id); a _wake jelzi az új/korábbi feladatot
+        self._heap = []
+        self._queued = set()
+        self._wake = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers)
+        # Futó feladatok és önreflexiók (leálláskor a lifespan zárja le őket)
+        self.tasks = BackgroundTasks("heartbeat")
+
     async def start(self):
         if not self.is_active:
             self.is_active = True
@@ -26,42 +56,90 @@ class Heartbeat:
             await self._loop()
 
     async def _loop(self):
-        log.info(f"[*] {self.protocol} Ciklus elindítva (10s polling).")
-        counter = 0
+        log.info(f"[*] {self.protocol} Eseményvezérelt ütemező elindítva ({self.workers} worker).")
+        await self._resync()
+        reflection_task = asyncio.create_task(self._reflection_loop())
+        next_resync = time.monotonic() + self.resync_seconds
+        try:
+            while self.is_active:
+                try:
+                    self._dispatch_due()
+                    # Alvás a következő esedékességig, az új feladat (notify_task) vagy a resync felébreszt
+                    timeout = next_resync - time.monotonic()
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - time.time())
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+                    except asyncio.TimeoutError:
+                        pass
+                    if time.monotonic() >= next_resync:
+                        # Más folyamatok által beszúrt feladatok felvétele
+                        await self._resync()
+                        next_resync = time.monotonic() + self.resync_seconds
+                except Exception as e:
+                    log.error(f"Heartbeat Loop Error: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            reflection_task.cancel()
+
+    async def _reflection_loop(self):
+        # Önreflexió ~5 percenként, a feladatütemezéstől függetlenül
         while self.is_active:
+            await asyncio.sleep(self.reflection_seconds)
+            self.tasks.spawn(self._run_reflection())
+
+    async def _resync(self):
+        rows = await asyncio.to_thread(self.db.get_pending_tasks)
+        for task_id, scheduled_for, priority in rows:
+            self.notify_task(task_id, scheduled_for, priority)
+
+    def notify_task(self, task_id, scheduled_for=None, priority=1):
+        """Új feladat bejelentése (pl. a Kernel utófeldolgozásából) - azonnal bekerül a kupacba."""
+        if task_id is None or task_id in self._queued:
+            return
+        heapq.heappush(self._heap, (_due_timestamp(scheduled_for), -(priority or 1), task_id))
+        self._queued.add(task_id)
+        self._wake.set()
+
+    def _dispatch_due(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task_id = heapq.heappop(self._heap)
+            self.tasks.spawn(self._run_task(task_id))
+
+    async def _run_task(self, task_id):
+        retry_at = task = None
+        async with self._slots:
             try:
-                # 1. Feladatok ellenőrzése - MINDEN körben lefut (10s)
-                await self._process_scheduled_tasks()
-                
-                # 2. Önreflexió - Csak minden 30. ciklusban (~5 perc)
-                counter += 1
-                if counter >= 30:
-                    # Háttérben indítjuk, hogy ne blokkolja a fő ciklust
-                    asyncio.create_task(self._run_reflection())
-                    counter = 0
-                    
-            except Exception as e:
-                log.error(f"Heartbeat Loop Error: {e}")
-            
-            await asyncio.sleep(10)
+                # Atomikus lefoglalás: ha más worker/folyamat már elvitte, kihagyjuk
+                claimed = await asyncio.to_thread(self.db.claim_task, task_id)
+                if not claimed:
+                    return
+                task = await asyncio.to_thread(self.db.get_task, task_id)
+                if task:
+                    retry_at = await self._process_scheduled_task(*task)
+            finally:
+                self._queued.discard(task_id)
+        if retry_at:
+            # Csak a kupacból való kikerülés után jelenthető be újra
+            self.notify_task(task_id, retry_at, task[3])
 
     async def _run_reflection(self):
         """Önálló folyamat az önreflexióhoz."""
         try:
             if await self._sentry_decision():
                 await self._scribe_sync()
+        except (LLMDeadlineExceeded, LLMPreempted) as e:
+            # Foglalt modell: a következő körben újra próbálkozunk
+            log.info(f"Önreflexió kihagyva: {e}")
         except Exception as e:
             log.error(f"Reflection Error: {e}")
 
-    async def _process_scheduled_tasks(self):
-        task = self.db.get_next_pending_task() 
-        if not task:
-            return
-
-        task_id, chat_id, description, priority = task
+    async def _process_scheduled_task(self, task_id, chat_id, description, priority):
+        """A feladat végrehajtása. Ha a modell foglalt volt (határidő / megszakítás), a feladat
+        újra 'pending' lesz, és az új időpontját adja vissza; egyébként None."""
         log.info(f"[*] ÉBRESZTŐ! Feladat észlelve: {description} (Chat: {chat_id})")
-        
-        self.db.update_task_status(task_id, "running")
 
         try:
             prompt = (
@@ -72,21 +150,45 @@ class Heartbeat:
             )
             
             target = self.king_model if priority >= 3 else self.scribe_model
-            response = await ollama_generate(target, prompt)
+            try:
+                response = await ollama_generate(target, prompt)
+            except (LLMDeadlineExceeded, LLMPreempted) as e:
+                return await self._defer_task(task_id, e)
+            self._retries.pop(task_id, None)
 
-            if "[NOTIFY_USER]" in response:
-                clean_msg = response.replace("[NOTIFY_USER]", "").strip()
-                await self.send_proactive_message(chat_id, clean_msg)
-            else:
-                await self.send_proactive_message(chat_id, response.strip())
+            clean_msg = response.replace("[NOTIFY_USER]", "").strip()
+            if not clean_msg:
+                # Üres válasz (Ollama hiba): üres üzenetet nem küldünk
+                log.error(f"Üres modellválasz, a feladat sikertelen (ID: {task_id}).")
+                await write_queue.write("update_task_status", task_id, "failed")
+                return None
+            await self.send_proactive_message(chat_id, clean_msg)
 
-            self.db.add_detailed_log(target, "TASK-EXEC", response, priority, vram=0.0)
-            self.db.update_task_status(task_id, "completed")
+            # Napló + állapotváltás az író szálon, közös batchben
+            await asyncio.gather(
+                write_queue.write("add_detailed_log", target, "TASK-EXEC", response, priority, vram=0.0),
+                write_queue.write("update_task_status", task_id, "completed"),
+            )
             log.info(f"[*] Feladat (ID: {task_id}) elvégezve.")
             
         except Exception as e:
             log.error(f"Hiba a feladat végrehajtása közben (ID: {task_id}): {e}")
-            self.db.update_task_status(task_id, "failed")
+            await write_queue.write("update_task_status", task_id, "failed")
+        return None
+
+    async def _defer_task(self, task_id, reason):
+        """Foglalt modell: a feladat retry_seconds múlva újra sorra kerül, max_retries-ig."""
+        attempts = self._retries.get(task_id, 0) + 1
+        if attempts > self.max_retries:
+            self._retries.pop(task_id, None)
+            log.error(f"Feladat (ID: {task_id}) {self.max_retries} halasztás után sikertelen: {reason}")
+            await write_queue.write("update_task_status", task_id, "failed")
+            return None
+        self._retries[task_id] = attempts
+        retry_at = (datetime.now() + timedelta(seconds=self.retry_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+        log.warning(f"Feladat (ID: {task_id}) elhalasztva {retry_at}-ig ({attempts}. alkalom): {reason}")
+        await write_queue.write("reschedule_task", task_id, retry_at)
+        return retry_at
 
     async def send_proactive_message(self, chat_id, content):
         import json
@@ -165,7 +267,8 @@ class Heartbeat:
             try: priority = int(response.split("|")[-1].strip())
             except: pass
 
-        self.db.add_detailed_log(
+        await write_queue.write(
+            "add_detailed_log",
             model=self.scribe_model, 
             protocol=self.protocol, 
             content=response, 
@@ -175,4 +278,5 @@ class Heartbeat:
         log.info(f"[*] Internal sync saved to DB (Priority: {priority})")
 
     def stop(self):
-        self.is_active = False
\ No newline at end of file
+        self.is_active = False
+        self._wake.set()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import httpx
+from core.logger import get_logger
+
+log = get_logger("http_client")
+
+# Alapértékek, ha a main_config.yaml 'http' szekciója hiányos
+DEFAULT_POOLS = {
+    "ollama": {"max_connections": 8, "max_keepalive_connections": 8, "keepalive_expiry": 120.0,
+               "connect_timeout": 5.0, "timeout": 120.0},
+    "searxng": {"max_connections": 4, "max_keepalive_connections": 4, "keepalive_expiry": 60.0,
+                "connect_timeout": 3.0, "timeout": 10.0},
+    "scrape": {"max_connections": 20, "max_keepalive_connections": 10, "keepalive_expiry": 30.0,
+               "connect_timeout": 3.0, "timeout": 5.0},
+}
+
+class HTTPClientRegistry:
+    """Megosztott, poolozott httpx kliensek gyűjteménye.
+
+    Célhostonként (ollama, searxng, scrape) egy-egy AsyncClient él, saját
+    kapcsolatlimittel és keep-alive-val. Az életciklust a main.py lifespan kezeli.
+    """
+
+    def __init__(self):
+        self.config = {}
+        self._clients = {}
+
+    def configure(self, http_cfg: dict = None):
+        """A main_config.yaml 'http' szekciójának átvétele. A már élő klienseket nem érinti."""
+        self.config = http_cfg or {}
+
+    def _pool_settings(self, name: str) -> dict:
+        settings = dict(DEFAULT_POOLS.get(name, DEFAULT_POOLS["ollama"]))
+        settings.update(self.config.get(name, {}) or {})
+        return settings
+
+    def get(self, name: str = "ollama") -> httpx.AsyncClient:
+        """Visszaadja (szükség esetén létrehozza) a névhez tartozó klienst."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            s = self._pool_settings(name)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=s["max_connections"],
+                    max_keepalive_connections=s["max_keepalive_connections"],
+                    keepalive_expiry=s["keepalive_expiry"],
+                ),
+                timeout=httpx.Timeout(s["timeout"], connect=s["connect_timeout"]),
+            )
+            self._clients[name] = client
+            log.info(f"HTTP pool létrehozva: {name} (max {s['max_connections']} kapcsolat)")
+        return client
+
+    async def aclose(self):
+        """Minden kliens lezárása leálláskor."""
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                log.error(f"HTTP pool lezárási hiba ({name}): {e}")
+        self._clients.clear()
+        log.info("HTTP poolok lezárva.")
+
+# Folyamatszintű példány: mindenki ezt importálja
+http_clients = HTTPClientRegistry()
@@ -1,11 +1,27 @@
 import asyncio
 import time
 import re
+import hashlib
+import threading
 from core.provider import LLMProvider
+from core.http_client import http_clients
+from core.vector_store import memory_indexer
 from core.state_manager import StateManager
-from core.reranker import Reranker
+from core.stream_filter import InternalBlockFilter
+from core.search_router import SearchRouter
+from core.prompt_stats import PromptCacheMeter
+from core.context_budget import ContextBudget
+from core.tracing import tracer
+from core.llm_scheduler import llm_scheduler
+from core.write_queue import write_queue
+from core.search_cache import search_cache
+from core.scraper import scraper
+from core.page_store import page_store
+from core.scrape_scheduler import scrape_scheduler
+from core.background import BackgroundTasks
 from core.logger import get_logger
 from core.database import DBManager
+from core.timing import startup_timer
 from modules import load_modules
 from datetime import datetime, timedelta
 
@@ -13,23 +29,89 @@ class Kernel:
     def __init__(self, config_dir: str):
         self.log = get_logger("kernel")
         self.router_log = get_logger("router")
-        self.state_manager = StateManager(config_dir)
-        self.db = DBManager()
+        with startup_timer.phase("init: config"):
+            self.state_manager = StateManager(config_dir)
+        with startup_timer.phase("init: adatbázis + migrációk"):
+            self.db = DBManager()
         
         cfg = self.state_manager.config
+        http_clients.configure(cfg.get("http", {}))
+        llm_scheduler.configure(cfg.get("llm_scheduler", {}))
+        write_queue.configure(cfg.get("write_queue", {}))
+        if cfg.get("memory", {}).get("vector_enabled", True):
+            with startup_timer.phase("init: vektor index"):
+                memory_indexer.configure(cfg)
         self.model_name = cfg["provider"]["model"]
-        self.provider = LLMProvider(cfg["provider"]["base_url"], self.model_name)
+        # generate: egyetlen kézzel formázott prompt; chat: /api/chat üzenet-előzménnyel
+        self.chat_mode = cfg["provider"].get("mode", "generate") == "chat"
+        self.provider = LLMProvider(cfg["provider"]["base_url"], self.model_name,
+                                    keep_alive=cfg["provider"].get("keep_alive"),
+                                    coalesce_max_temp=cfg["provider"].get("coalesce_max_temp", 0.2))
         
         router_model = cfg.get("router", {}).get("model", self.model_name)
-        self.small_provider = LLMProvider(cfg["provider"]["base_url"], router_model)
+        self.small_provider = LLMProvider(cfg["provider"]["base_url"], router_model,
+                                          keep_alive=cfg["provider"].get("keep_alive"),
+                                          coalesce_max_temp=cfg["provider"].get("coalesce_max_temp", 0.2))
+        router_cfg = cfg.get("router", {})
+        self.search_router = SearchRouter(
+            router_cfg,
+            embed_fn=lambda text: self.small_provider.generate_embedding(
+                text, model=cfg.get("memory", {}).get("embedding_model", "embeddinggemma:latest")
+            )
+        )
+        
+        self.prompt_meter = PromptCacheMeter()
+        self.context_budget = ContextBudget(cfg)
+        search_cache.configure(cfg.get("search_cache", {}), db=self.db)
+        scraper.configure(cfg.get("scraper", {}))
+        page_store.configure(cfg.get("page_store", {}), db=self.db)
+        scrape_scheduler.configure(cfg.get("scrape_scheduler", {}))
+        # A main.py lifespan állítja be (eseményvezérelt feladatütemező)
+        self.heartbeat = None
+        # Utófeldolgozás, indexelés, warm-up: leálláskor a lifespan megvárja / megszakítja őket
+        self.background = BackgroundTasks("kernel")
         
-        rerank_cfg = cfg.get("reranker", {})
-        self.reranker = Reranker(rerank_cfg) if rerank_cfg.get("enabled") else None
-        self.modules = load_modules()
+        # A reranker (torch + transformers) és a modulok lustán, első használatkor töltődnek be
+        self._reranker = None
+        self._reranker_lock = threading.Lock()
+        with startup_timer.phase("init: modul regisztráció"):
+            self.modules = load_modules(lazy=cfg.get("startup", {}).get("lazy_modules", True))
         
         self.log.info(f"Kernel v2.2 (SoulCore) aktív. Király: {self.model_name}")
 
+    def _load_reranker(self):
+        """A reranker betöltése (szálbiztos, egyszeri). Blokkoló, ezért szálból hívjuk."""
+        with self._reranker_lock:
+            if self._reranker is None:
+                rerank_cfg = self.state_manager.config.get("reranker", {})
+                with startup_timer.phase("lusta: reranker import + modell"):
+                    from core.reranker import Reranker
+                    self._reranker = Reranker(rerank_cfg)
+        return self._reranker
+
+    async def get_reranker(self):
+        """A reranker példány, vagy None, ha ki van kapcsolva. Az első hívás tölti be."""
+        if not self.state_manager.config.get("reranker", {}).get("enabled"):
+            return None
+        if self._reranker is None:
+            await asyncio.to_thread(self._load_reranker)
+        return self._reranker
+
+    def warm_up(self):
+        """Háttérbeli előtöltés induláskor (a szerver már fogad kéréseket)."""
+        with startup_timer.phase("warm-up: modulok"):
+            self.modules.warm_up(startup_timer)
+        if self.state_manager.config.get("reranker", {}).get("enabled"):
+            self._load_reranker()
+        startup_timer.report("Warm-up kész")
+
     async def should_trigger_search(self, user_message: str) -> bool:
+        """Többszintű döntés: heurisztika és döntés-cache, az LLM csak ha egyik sem biztos."""
+        return await self.search_router.decide(user_message, self._llm_search_decision)
+
+    async def _llm_search_decision(self, user_message: str):
+        """True/False a modell válasza szerint; None, ha a válaszban nincs döntési token
+        (a provider a hibákat szövegként adja vissza, azokat nem szabad INTERNAL-nak venni)."""
         decision_prompt = (
             "Internal Reasoning Engine: Analyze the following query.\n"
             f"Query: \"{user_message}\"\n\n"
@@ -38,21 +120,117 @@ class Kernel:
         )
         try:
             decision = await self.small_provider.generate_response(
-                decision_prompt, system_prompt="Search Decision Logic.", temp=0.1
+                decision_prompt, system_prompt="Search Decision Logic.", temp=0.1, priority="router"
             )
-            return "[SEARCH]" in decision.upper()
-        except Exception:
-            self.log.warning("Router hiba, alapértelmezett: INTERNAL")
-            return False
+            decision = (decision or "").upper()
+            if "[SEARCH]" in decision:
+                return True
+            if "[INTERNAL]" in decision:
+                return False
+            self.log.warning(f"Router: értelmezhetetlen válasz: {decision[:80]!r}")
+            return None
+        except Exception as e:
+            self.log.warning(f"Router hiba: {e}")
+            return None
 
-    async def process_message(self, user_message: str, conv_id: str = "default_session"):
+    async def _stage(self, name: str, awaitable, fallback=None):
+        """Egy pipeline-lépés saját időkorláttal és fallback értékkel.
+
+        Időtúllépésnél a lépés feladatát lemondjuk, hiba esetén naplózunk; a kör
+        mindkét esetben a fallback értékkel megy tovább.
+        """
+        timeout = self.state_manager.config.get("pipeline", {}).get("timeouts", {}).get(name)
+        with tracer.span(name) as span:
+            try:
+                return await asyncio.wait_for(awaitable, timeout)
+            except asyncio.TimeoutError:
+                span["status"] = "timeout"
+                self.log.warning(f"Lépés időtúllépés: {name} ({timeout}s), fallback.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                span["status"] = "error"
+                self.log.error(f"Lépés hiba: {name}: {e}")
+        return fallback
+
+    async def _run_search(self, user_message: str):
+        search_mod = self.modules.get("search")
+        if not (search_mod and isinstance(search_mod, dict) and "execute" in search_mod):
+            return []
+        self.log.info("Keresési folyamat indítása...")
+        return await search_mod["execute"](user_message, self.state_manager.config) or []
+
+    async def _context_branch(self, user_message: str, eligible: bool):
+        """Router -> keresés -> rerank -> RAG tisztítás ág.
+
+        Ha a gyors router-szintek nem döntenek, a keresés spekulatívan már az LLM-router
+        mellett elindul, és INTERNAL döntésnél lemondjuk.
+        """
+        if not eligible:
+            return None
+
+        pipeline_cfg = self.state_manager.config.get("pipeline", {})
+        needs_search = self.search_router.peek(user_message)
+        search_task = None
+
+        try:
+            if needs_search is None:
+                if pipeline_cfg.get("speculative_search", True):
+                    search_task = asyncio.create_task(self._run_search(user_message))
+                needs_search = await self._stage(
+                    "router",
+                    self.search_router.decide(user_message, self._llm_search_decision, skip_peek=True),
+                    fallback=False
+                )
+
+            if not needs_search:
+                if search_task:
+                    search_task.cancel()
+                    self.log.info("Spekulatív keresés lemondva (INTERNAL).")
+                return None
+
+            if search_task is None:
+                search_task = asyncio.create_task(self._run_search(user_message))
+            search_results = await self._stage("search", search_task, fallback=[])
+        finally:
+            # Az ág megszakadt (kliens lelépett, router hiba) a keresés bevárása előtt:
+            # a keresés és a scrape se fusson tovább a háttérben
+            if search_task is not None and not search_task.done():
+                search_task.cancel()
+        if not search_results:
+            return None
+
+        module_result = None
+        reranker = await self.get_reranker()
+        if reranker:
+            module_result = await self._stage(
+                "rerank", self.rerank_results(user_message, search_results),
+                fallback=self._simple_combine(search_results)
+            )
+        else:
+            module_result = self._simple_combine(search_results)
+        if not module_result or not module_result.get("context"):
+            return None
+
+        # A RAG tisztítás is ebben az ágban fut, párhuzamosan a memória-lekérdezésekkel.
+        # Fallback: a nyers (összefűzött) kontextus megy tovább.
+        # A kis modell bemenete is keretet kap (a nagy bemenet lassú prompt-kiértékelést jelent)
+        module_result["context"] = self.context_budget.fit_text(
+            module_result["context"], self.context_budget.limit("rag_input")
+        )
+        module_result["cleaned_context"] = await self._stage(
+            "rag_clean", self._clean_context(module_result["context"]),
+            fallback=module_result["context"]
+        )
+        return module_result
+
+    async def _prepare_turn(self, user_message: str, conv_id: str):
+        """A generálás előtti közös lépések kis DAG-ként: a keresési ág és a
+        jegyzet/memória lekérdezések párhuzamosan futnak, mindegyik saját időkorláttal."""
         self.log.info(f"--- BEÉRKEZŐ ADATOK ---")
         self.log.info(f"User Message: {user_message[:50]}...")
         self.log.info(f"Received conv_id: {conv_id}")
         
-        start_time = time.time()
-        module_result = None
-        
         freedom_mode = self.db.get_setting("freedom_mode", "false").lower() == "true"
         msg_lower = user_message.lower().strip()
         is_meta = any(t in msg_lower for t in ["### task:", "follow-up", "generate title"])
@@ -62,43 +240,93 @@ class Kernel:
         else:
             current_notes_task = asyncio.to_thread(self.db.get_notes_for_conversation, conv_id)
         
-        global_memories_task = asyncio.to_thread(self.db.get_long_term_memories)
-
-        needs_search = False
-        if not is_meta and len(msg_lower.split()) >= 3:
-            needs_search = await self.should_trigger_search(user_message)
+        global_memories_task = asyncio.to_thread(self._fetch_relevant_memories, user_message)
+        eligible = not is_meta and len(msg_lower.split()) >= 3
 
-        if needs_search:
-            search_mod = self.modules.get("search")
-            if search_mod and isinstance(search_mod, dict) and "execute" in search_mod:
-                try:
-                    self.log.info("Keresési folyamat indítása...")
-                    search_results = await search_mod["execute"](user_message, self.state_manager.config)
-                    if search_results:
-                        if self.reranker:
-                            module_result = await self.rerank_results(user_message, search_results)
-                        else:
-                            module_result = self._simple_combine(search_results)
-                except Exception as e:
-                    self.log.error(f"Hiba a keresőmodul futtatása közben: {e}")
-                    module_result = None
-
-        current_notes, global_memories = await asyncio.gather(current_notes_task, global_memories_task)
-
-        raw_response = await self.generate_final_response(
-            user_message, module_result, conv_id, 
-            notes=current_notes, memories=global_memories
+        module_result, current_notes, global_memories = await asyncio.gather(
+            self._context_branch(user_message, eligible),
+            self._stage("notes", current_notes_task, fallback=[]),
+            self._stage("memories", global_memories_task, fallback=[]),
         )
+        return module_result, current_notes, global_memories, is_meta
+
+    def _fetch_relevant_memories(self, user_message: str):
+        """Top-k releváns tény (FTS5/BM25) a memória token-keretén belül, promptkész sorokként."""
+        top_k = self.state_manager.config.get("memory", {}).get("top_k", 8)
+        lines = [
+            f"- {subject} {predicate or ''} {obj or ''}".strip()
+            for subject, predicate, obj in self.db.search_long_term_memories(user_message, limit=top_k)
+        ]
+        return self.context_budget.fit_items(lines, self.context_budget.limit("memories"))
+
+    async def process_message(self, user_message: str, conv_id: str = "default_session"):
+        start_time = time.time()
+        with tracer.trace(conv_id):
+            module_result, current_notes, global_memories, is_meta = await self._prepare_turn(user_message, conv_id)
+
+            raw_response = await self.generate_final_response(
+                user_message, module_result, conv_id, 
+                notes=current_notes, memories=global_memories
+            )
 
-        # Post-processing: Notepad mentés és Task szűrés
-        asyncio.create_task(self._async_post_process(raw_response, conv_id, is_meta))
+            # Post-processing: Notepad mentés és Task szűrés (a task örökli a trace azonosítót)
+            self.background.spawn(self._async_post_process(raw_response, conv_id, is_meta, user_message))
 
         clean_response = re.sub(r'<(notepad|task|logic)>.*?(</\1>|$)', '', raw_response, flags=re.DOTALL | re.IGNORECASE).strip()
 
         self.log.info(f"Kész. Idő: {time.time() - start_time:.2f}s")
         return clean_response
 
-    async def _async_post_process(self, raw_response, conv_id, is_meta):
+    async def process_message_stream(self, user_message: str, conv_id: str = "default_session"):
+        """Mint a process_message, de a tisztított választ token-darabonként yield-eli."""
+        start_time = time.time()
+        with tracer.trace(conv_id):
+            module_result, current_notes, global_memories, is_meta = await self._prepare_turn(user_message, conv_id)
+
+            block_filter = InternalBlockFilter()
+            raw_parts = []
+            first_token_at = None
+            try:
+                async for token in self.generate_final_response_stream(
+                    user_message, module_result, conv_id,
+                    notes=current_notes, memories=global_memories
+                ):
+                    if first_token_at is None:
+                        first_token_at = time.time()
+                        tracer.span_seconds.observe(first_token_at - start_time, span="ttft")
+                    raw_parts.append(token)
+                    visible = block_filter.feed(token)
+                    if visible:
+                        yield visible
+
+                tail = block_filter.flush()
+                if tail:
+                    yield tail
+            finally:
+                # A teljes nyers szöveg (blokkokkal együtt) megy az utófeldolgozásra, akkor is, ha a kliens lelépett
+                raw_response = "".join(raw_parts)
+                if raw_response:
+                    self.background.spawn(self._async_post_process(raw_response, conv_id, is_meta, user_message))
+                ttft = f"{first_token_at - start_time:.2f}s" if first_token_at else "-"
+                self.log.info(f"Kész (stream). Első token: {ttft} | Idő: {time.time() - start_time:.2f}s")
+
+    async def _async_post_process(self, raw_response, conv_id, is_meta, user_message=None):
+        with tracer.span("post_process"):
+            await self._post_process_blocks(raw_response, conv_id, is_meta, user_message)
+
+    async def _post_process_blocks(self, raw_response, conv_id, is_meta, user_message=None):
+        # 0. Előzmény mentése a chat módhoz (a tisztított válasszal, a belső blokkok nélkül)
+        if self.chat_mode and user_message and not is_meta:
+            clean = re.sub(r'<(notepad|task|logic)>.*?(</\1>|$)', '', raw_response, flags=re.DOTALL | re.IGNORECASE).strip()
+            try:
+                # Az író szál sorrendben, közös batchben véglegesíti a kettőt
+                await asyncio.gather(
+                    write_queue.write("add_message", conv_id, "user", user_message),
+                    write_queue.write("add_message", conv_id, "assistant", clean),
+                )
+            except Exception as e:
+                self.log.error(f"Előzmény mentési hiba: {e}")
+
         block_pattern = r'<(notepad|task|logic)>(.*?)(?=<(notepad|task|logic)>|$)'
         internal_blocks = re.findall(block_pattern, raw_response, flags=re.DOTALL | re.IGNORECASE)
         
@@ -110,8 +338,14 @@ class Kernel:
         # 1. Notepad mentése
         if "notepad" in extracted_data and not is_meta:
             try:
-                self.db.add_short_term_note(conv_id, self.model_name, "Self-Notepad", extracted_data["notepad"], importance=0.7)
+                await write_queue.write(
+                    "add_short_term_note", conv_id, self.model_name, "Self-Notepad",
+                    extracted_data["notepad"], importance=0.7
+                )
                 self.router_log.info(f"[{self.model_name}] Scribe: Jegyzet rögzítve.")
+                # Vektor indexbe is bekerül, hogy később szemantikusan visszakereshető legyen
+                note_ref = hashlib.md5(f"{conv_id}:{extracted_data['notepad']}".encode()).hexdigest()
+                self.background.spawn(memory_indexer.index_text("note", note_ref, extracted_data["notepad"]))
             except Exception as e:
                 self.log.error(f"Scribe mentési hiba: {e}")
 
@@ -134,58 +368,142 @@ class Kernel:
                 
                 scheduled_for = parts[2] if len(parts) > 2 else (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
 
-                query = """
-                    INSERT INTO task_scheduler (chat_id, task_description, priority, status, scheduled_for)
-                    VALUES (?, ?, ?, 'pending', ?)
-                """
-                self.db._execute(query, (conv_id, description, priority, scheduled_for), commit=True)
+                task_id = await write_queue.write("add_task", conv_id, description, priority, scheduled_for)
                 self.router_log.info(f"[*] FELADAT RÖGZÍTVE: {description} (Prio: {priority})")
+                # Az ütemező azonnal értesül, nem kell a következő DB-szinkronra várnia
+                if self.heartbeat and task_id is not None:
+                    self.heartbeat.notify_task(task_id, scheduled_for, priority)
             except Exception as e:
                 self.log.error(f"Task ütemezési hiba: {e}")
 
-    async def generate_final_response(self, user_message: str, module_result: dict, conv_id: str, 
-                                    notes=None, memories=None):
+    async def _build_prompt_parts(self, module_result: dict, conv_id: str, notes=None, memories=None,
+                                  user_message: str = ""):
+        """(stabil prefix, változó blokk, előzmény) a végső generáláshoz, token-keretre szabva.
+
+        Minden szakasz (RAG kontextus, memóriák, jegyzetek, chat módban az előzmény) a saját
+        keretére vágódik, a teljes túllépést pedig a context_budget.priority szerint vágjuk.
+        """
         cleaned_context = ""
-        if module_result and module_result.get('context'):
-            cleaned_context = await self.small_provider.generate_response(
-                f"INPUT DATA:\n{module_result['context']}", 
-                system_prompt=self.state_manager.get_rag_preprocessor_prompt(), 
-                temp=0.1
-            )
+        if module_result and module_result.get('cleaned_context') is not None:
+            # A pipeline már letisztította (párhuzamosan a többi lépéssel)
+            cleaned_context = module_result['cleaned_context']
+        elif module_result and module_result.get('context'):
+            cleaned_context = await self._clean_context(module_result['context'])
 
-        full_system_prompt = self.state_manager.assemble_kope_system_prompt(
-            model_name=self.model_name, 
-            cleaned_context=cleaned_context
-        )
-        
-        extras = []
-        if memories: extras.append(f"Global Knowledge (Library): {memories}")
-        if notes: 
+        formatted_notes = []
+        if notes:
             try:
-                formatted_list = []
                 for n in notes[::-1]:
                     val = n[1] if isinstance(n, (tuple, list)) and len(n) > 1 else str(n)
-                    formatted_list.append(f"- {val}")
-                extras.append(f"Your Previous Internal Thoughts ({self.model_name}):\n" + "\n".join(formatted_list))
+                    formatted_notes.append(f"- {val}")
             except Exception as e:
                 self.log.error(f"Memory formatting error: {e}")
+
+        history = await asyncio.to_thread(self._load_history, conv_id) if self.chat_mode else []
+
+        prefix = self.state_manager.get_stable_prefix(self.model_name)
+        fitted = self.context_budget.allocate(
+            fixed_tokens=self.context_budget.count(prefix) + self.context_budget.count(user_message) + 64,
+            sections={
+                "rag": cleaned_context or "",
+                "memories": memories or [],
+                "notes": formatted_notes,
+                "history": history,
+            }
+        )
+
+        extras = []
+        if fitted["memories"]: extras.append("Global Knowledge (Library):\n" + "\n".join(fitted["memories"]))
+        if fitted["notes"]:
+            extras.append(f"Your Previous Internal Thoughts ({self.model_name}):\n" + "\n".join(fitted["notes"]))
         
+        extras_block = ""
         if extras:
-            full_system_prompt += "\n\n### SOULCORE INTERNAL ACCESS (Session: " + conv_id + "):\n" + "\n".join(extras)
-
-        # Szigorúbb instrukciók Kópénak
-        full_system_prompt += (
-            "\n\n### OUTPUT FORMAT RULES:\n"
-            "1. Respond in HUNGARIAN.\n"
-            "2. Add a <notepad> section in ENGLISH at the end for reflections.\n"
-            "3. IF a task is needed: Add a <task> block. NEVER use the word 'Description'. "
-            "SUMMARIZE the actual task. Format: <task>Task summary | Priority(1-5) | YYYY-MM-DD HH:MM</task>"
+            extras_block = "### SOULCORE INTERNAL ACCESS (Session: " + conv_id + "):\n" + "\n".join(extras)
+
+        # A kimeneti szabályok már a stabil prefixben vannak (KV-cache barát sorrend)
+        return (
+            prefix,
+            self.state_manager.assemble_volatile_block(fitted["rag"], extras_block),
+            fitted["history"]
+        )
+
+    async def _build_final_system_prompt(self, module_result: dict, conv_id: str, notes=None, memories=None,
+                                         user_message: str = ""):
+        prefix, volatile, _ = await self._build_prompt_parts(module_result, conv_id, notes, memories, user_message)
+        return prefix + volatile
+
+    async def _build_chat_messages(self, user_message: str, module_result: dict, conv_id: str,
+                                   notes=None, memories=None):
+        """Chat mód: stabil system üzenet + eltárolt előzmény + a friss kontextus a legutolsó user üzenetben.
+
+        Így a system prompt és az előzmény bájtra azonos marad kérésről kérésre, és az
+        Ollama a szerveroldali KV-cache-t a legutolsó fordulóig újrahasznosítja.
+        """
+        prefix, volatile, history = await self._build_prompt_parts(
+            module_result, conv_id, notes, memories, user_message
+        )
+        return (
+            [{"role": "system", "content": prefix}]
+            + history
+            + [{"role": "user", "content": f"{volatile}\n### USER MESSAGE:\n{user_message}"}]
         )
 
-        return await self.provider.generate_response(
-            user_message, system_prompt=full_system_prompt, temp=0.8
+    def _load_history(self, conv_id: str):
+        """Az előzmény vége időrendben; a token-keretre vágást a ContextBudget végzi."""
+        limit = self.state_manager.config["provider"].get("history_messages", 40)
+        return [{"role": role, "content": content} for role, content in self.db.get_recent_messages(conv_id, limit=limit)]
+
+    async def _clean_context(self, raw_context: str):
+        """RAG tisztítás a kis modellel (nyers találatok -> természetes magyar szöveg)."""
+        return await self.small_provider.generate_response(
+            f"INPUT DATA:\n{raw_context}", 
+            system_prompt=self.state_manager.get_rag_preprocessor_prompt(), 
+            temp=0.1,
+            priority="router"
         )
 
+    async def generate_final_response(self, user_message: str, module_result: dict, conv_id: str, 
+                                    notes=None, memories=None):
+        stats = {}
+        with tracer.span("prompt_build"):
+            if self.chat_mode:
+                messages = await self._build_chat_messages(user_message, module_result, conv_id, notes, memories)
+            else:
+                full_system_prompt = await self._build_final_system_prompt(module_result, conv_id, notes, memories, user_message)
+        with tracer.span("generation"):
+            if self.chat_mode:
+                response = await self.provider.chat_response(messages, temp=0.8, stats=stats)
+            else:
+                response = await self.provider.generate_response(
+                    user_message, system_prompt=full_system_prompt, temp=0.8, stats=stats
+                )
+        self._measure_prompt_cache(stats, conv_id)
+        return response
+
+    async def generate_final_response_stream(self, user_message: str, module_result: dict, conv_id: str,
+                                           notes=None, memories=None):
+        """A generate_final_response streamelt párja: nyers token-darabokat yield-el."""
+        stats = {}
+        with tracer.span("prompt_build"):
+            if self.chat_mode:
+                messages = await self._build_chat_messages(user_message, module_result, conv_id, notes, memories)
+                token_stream = self.provider.stream_chat(messages, temp=0.8, stats=stats)
+            else:
+                full_system_prompt = await self._build_final_system_prompt(module_result, conv_id, notes, memories, user_message)
+                token_stream = self.provider.stream_response(
+                    user_message, system_prompt=full_system_prompt, temp=0.8, stats=stats
+                )
+        with tracer.span("generation"):
+            async for token in token_stream:
+                yield token
+        self._measure_prompt_cache(stats, conv_id)
+
+    def _measure_prompt_cache(self, stats: dict, conv_id: str):
+        """Mérési mód (prompt_cache.measure): kiértékelt vs. cache-ből jött prompt tokenek."""
+        if self.state_manager.config.get("prompt_cache", {}).get("measure", False) and stats:
+            self.prompt_meter.record(stats, label=conv_id)
+
     def _simple_combine(self, results):
         ctx = ""
         for r in results[:3]:
@@ -194,7 +512,27 @@ class Kernel:
 
     async def rerank_results(self, query: str, search_results: list):
         rag_cfg = self.state_manager.config.get("rag", {})
-        passed = [f"Source: {res.get('title')}\n{res.get('content')}" 
-                  for res in search_results 
-                  if self.reranker.get_local_score(query, f"{res.get('title')} {res.get('content')}") >= rag_cfg.get("threshold", 0.15)]
-        return {"context": "\n\n".join(passed)} if passed else None
\ No newline at end of file
+        threshold = self.state_manager.config.get("reranker", {}).get("threshold", rag_cfg.get("threshold", 0.15))
+        max_tokens = rag_cfg.get("max_context_length", 2000)
+
+        # Egyetlen batch forward pass, az event loopon kívül
+        reranker = await self.get_reranker()
+        scores = await reranker.score_batch(
+            query, [f"{res.get('title')} {res.get('content')}" for res in search_results]
+        )
+        ranked = sorted(zip(scores, search_results), key=lambda x: x[0], reverse=True)
+
+        passed, used = [], 0
+        for score, res in ranked:
+            if score < threshold:
+                break
+            block = f"Source: {res.get('title')}\n{res.get('content')}"
+            cost = self.context_budget.count(block)
+            if used + cost > max_tokens:
+                if not passed:
+                    # A legjobb találat akkor is bekerül, csak megvágva
+                    passed.append(self.context_budget.fit_text(block, max_tokens))
+                break
+            passed.append(block)
+            used += cost
+        return {"context": "\n\n".join(passed)} if passed else None
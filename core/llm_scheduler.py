@@ -0,0 +1,201 @@
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from core.logger import get_logger
+from core.tracing import metrics
+
+log = get_logger("llm_scheduler")
+
+# Kisebb szám = előrébb a sorban
+PRIORITIES = {"interactive": 0, "router": 1, "background": 2}
+
+class LLMDeadlineExceeded(Exception):
+    """A kérés nem kapott slotot a határidőn belül."""
+
+class LLMPreempted(Exception):
+    """A háttérkérést egy interaktív kérés miatt megszakítottuk."""
+
+class _Waiter:
+    __slots__ = ("priority", "future", "task", "preempted")
+
+    def __init__(self, priority: str, future):
+        self.priority = priority
+        self.future = future
+        self.task = None
+        self.preempted = False
+
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.holders = []  # slotot tartó _Waiter-ek
+        self.heap = []     # (prioritás, sorszám, _Waiter)
+
+class LLMScheduler:
+    """Központi belépés-vezérlés az Ollama hívásokhoz.
+
+    Modellenként legfeljebb 'limit' párhuzamos kérés fut, a várakozók prioritás
+    (interactive > router > background), azon belül érkezés szerint kapnak slotot.
+    Amíg interaktív forgalom van (vagy az utolsó óta nem telt el background_defer_seconds),
+    a háttérkérések várnak; ha egy interaktív kérés foglalt modellre vár, a slotot tartó
+    háttérkérést megszakíthatjuk (preempt_background), az a run() hívásban újra sorba áll.
+    """
+
+    def __init__(self):
+        self.default_limit = 2
+        self.model_limits = {}
+        self.deadlines = {"interactive": 120.0, "router": 15.0, "background": 600.0}
+        self.background_defer = 5.0
+        self.preempt_background = True
+        self._queues = {}
+        self._seq = itertools.count()
+        self._interactive_active = 0
+        self._last_interactive = 0.0
+        self._wakeup = None
+        self.counters = {"granted": 0, "deadline_exceeded": 0, "preempted": 0, "deferred": 0}
+        self.wait_seconds = metrics.histogram(
+            "soulcore_llm_queue_wait_seconds", "LLM hívások várakozása a schedulerben.",
+            label_names=("priority",)
+        )
+
+    def configure(self, sched_cfg: dict):
+        self.default_limit = sched_cfg.get("default_concurrency", self.default_limit)
+        self.model_limits = dict(sched_cfg.get("models", {}) or {})
+        self.deadlines.update(sched_cfg.get("deadlines", {}) or {})
+        self.background_defer = sched_cfg.get("background_defer_seconds", self.background_defer)
+        self.preempt_background = sched_cfg.get("preempt_background", self.preempt_background)
+        for model, queue in self._queues.items():
+            queue.limit = self.model_limits.get(model, self.default_limit)
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self.model_limits.get(model, self.default_limit))
+        return queue
+
+    def _background_blocked(self) -> bool:
+        return (self._interactive_active > 0
+                or time.monotonic() - self._last_interactive < self.background_defer)
+
+    def _dispatch(self, model: str):
+        queue = self._queue(model)
+        while queue.heap and len(queue.holders) < queue.limit:
+            _, _, waiter = queue.heap[0]
+            if waiter.future.done():
+                heapq.heappop(queue.heap)  # lejárt vagy lemondott várakozó
+                continue
+            if waiter.priority == "background" and self._background_blocked():
+                self._schedule_wakeup()
+                break
+            heapq.heappop(queue.heap)
+            queue.holders.append(waiter)
+            waiter.future.set_result(True)
+
+    def _dispatch_all(self):
+        for model in list(self._queues):
+            self._dispatch(model)
+
+    def _schedule_wakeup(self):
+        """A halasztott háttérkérések újrapróbálása a türelmi idő leteltével."""
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            return
+        loop = asyncio.get_running_loop()
+
+        def wake():
+            self._wakeup = None
+            self._dispatch_all()
+
+        self._wakeup = loop.call_later(max(self.background_defer, 0.1), wake)
+
+    def _maybe_preempt(self, model: str):
+        if not self.preempt_background:
+            return
+        queue = self._queue(model)
+        if len(queue.holders) < queue.limit:
+            return
+        for holder in queue.holders:
+            if holder.priority == "background" and not holder.preempted and holder.task:
+                holder.preempted = True
+                self.counters["preempted"] += 1
+                log.info(f"Háttérkérés megszakítva interaktív forgalom miatt ({model}).")
+                holder.task.cancel()
+                return
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: str = "interactive", deadline: float = None):
+        """Egy slot az adott modellhez; a blokk végén felszabadul."""
+        if priority not in PRIORITIES:
+            priority = "interactive"
+        timeout = deadline if deadline is not None else self.deadlines.get(priority)
+        loop = asyncio.get_running_loop()
+        queue = self._queue(model)
+        waiter = _Waiter(priority, loop.create_future())
+        waiter.task = asyncio.current_task()
+
+        if priority == "interactive":
+            self._interactive_active += 1
+            self._last_interactive = time.monotonic()
+
+        t0 = time.perf_counter()
+        try:
+            heapq.heappush(queue.heap, (PRIORITIES[priority], next(self._seq), waiter))
+            self._dispatch(model)
+            if not waiter.future.done():
+                if priority == "background":
+                    self.counters["deferred"] += 1
+                elif priority == "interactive":
+                    self._maybe_preempt(model)
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+                except asyncio.TimeoutError:
+                    self.counters["deadline_exceeded"] += 1
+                    raise LLMDeadlineExceeded(f"{model}: nincs szabad slot {timeout}s alatt ({priority})")
+            self.counters["granted"] += 1
+            self.wait_seconds.observe(time.perf_counter() - t0, priority=priority)
+            yield
+        except asyncio.CancelledError:
+            if waiter.preempted:
+                # A megszakítás a scheduler műve: a hívó LLMPreempted-et kap, a task él tovább
+                if hasattr(waiter.task, "uncancel"):
+                    waiter.task.uncancel()
+                raise LLMPreempted(model)
+            raise
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+            if waiter in queue.holders:
+                queue.holders.remove(waiter)
+            if priority == "interactive":
+                self._interactive_active -= 1
+                self._last_interactive = time.monotonic()
+            self._dispatch_all()
+
+    async def run(self, model: str, fn, priority: str = "background", deadline: float = None, retries: int = 3):
+        """fn() futtatása slotban; megszakított háttérkérésnél újra sorba áll."""
+        for attempt in range(retries + 1):
+            try:
+                async with self.slot(model, priority, deadline):
+                    return await fn()
+            except LLMPreempted:
+                if attempt == retries:
+                    raise
+                log.info(f"Háttérkérés újra sorban ({model}, {attempt + 1}. próbálkozás).")
+
+    def get_stats(self) -> dict:
+        models = {}
+        for model, queue in self._queues.items():
+            waiting = {name: 0 for name in PRIORITIES}
+            for _, _, waiter in queue.heap:
+                if not waiter.future.done():
+                    waiting[waiter.priority] += 1
+            models[model] = {"limit": queue.limit, "active": len(queue.holders), "queued": waiting}
+        return {
+            **self.counters,
+            "queue_depth": sum(sum(m["queued"].values()) for m in models.values()),
+            "interactive_active": self._interactive_active,
+            "background_deferred_now": self._background_blocked(),
+            "models": models,
+        }
+
+llm_scheduler = LLMScheduler()
@@ -1,7 +1,18 @@
 import logging
 import os
+import contextvars
 from logging.handlers import RotatingFileHandler
 
+# Az aktuális kérés (beszélgetés-kör) trace azonosítója; a core.tracing állítja be
+trace_id_var = contextvars.ContextVar("trace_id", default="-")
+
+class TraceIdFilter(logging.Filter):
+    """A trace azonosító beírása minden log rekordba (%(trace_id)s a formátumban)."""
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
 def get_logger(name):
     logger = logging.getLogger(name)
     # Ha már vannak handler-ek, ne adjunk hozzá újakat (duplikáció elkerülése reloadkor)
@@ -9,11 +20,12 @@ def get_logger(name):
         return logger
 
     logger.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s')
     
     # 1. Konzolos kimenet
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(TraceIdFilter())
     logger.addHandler(console_handler)
     
     # 2. Fájl kimenet (külön fájl minden modulnak a logs/ mappában)
@@ -25,6 +37,7 @@ def get_logger(name):
         encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
+    file_handler.addFilter(TraceIdFilter())
     logger.addHandler(file_handler)
     
     return logger
@@ -0,0 +1,83 @@
+"""Verziózott sémamigrációk a soulcore.db-hez.
+
+A DBManager._init_db által létrehozott táblák a 0. verzió. Minden további
+sémaváltozás ide kerül egy új, növekvő sorszámú bejegyzésként; a már kiadott
+migrációkat TILOS utólag módosítani (a meglévő adatbázisok nem futtatják újra).
+
+Az OPTIONAL_MIGRATIONS-ben szereplő verziók hibája (pl. FTS5 nélküli SQLite build) nem
+állítja meg a későbbieket: kimaradnak, és minden induláskor újra megpróbáljuk őket.
+"""
+
+# v2: FTS5 - ha a SQLite build nem tudja, a tény-keresés LIKE-ra esik vissza
+OPTIONAL_MIGRATIONS = {2}
+
+MIGRATIONS = [
+    (1, "Másodlagos indexek a forró lekérdezésekhez", [
+        # get_notes_for_conversation / clear_short_term_memory
+        "CREATE INDEX IF NOT EXISTS idx_stn_conv_created ON short_term_notes (conv_id, created_at)",
+        # get_notes_by_model: WHERE model_origin = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_stn_model_created ON short_term_notes (model_origin, created_at)",
+        # get_pending_tasks: a várakozó feladatok (id, scheduled_for, priority) táblaolvasás nélkül
+        "CREATE INDEX IF NOT EXISTS idx_task_pending ON task_scheduler (status, scheduled_for, priority)",
+        # Lejárt cache sorok keresése / takarítása
+        "CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache (expires_at)",
+        # get_internal_summary: ORDER BY timestamp DESC LIMIT ? (a raw_content-et a táblából olvassuk,
+        # az indexbe másolva kb. duplázná a napló tárhelyét és írási költségét)
+        "CREATE INDEX IF NOT EXISTS idx_thought_logs_ts ON internal_thought_logs (timestamp)",
+    ]),
+    (2, "FTS5 teljes szöveges index a hosszútávú memóriához", [
+        # External-content FTS tábla: a szöveget nem duplikálja, a long_term_memory sorait indexeli
+        """CREATE VIRTUAL TABLE IF NOT EXISTS long_term_memory_fts USING fts5(
+               subject, predicate, object_detail,
+               content='long_term_memory', content_rowid='id',
+               tokenize='unicode61 remove_diacritics 2'
+           )""",
+        """CREATE TRIGGER IF NOT EXISTS ltm_fts_ai AFTER INSERT ON long_term_memory BEGIN
+               INSERT INTO long_term_memory_fts (rowid, subject, predicate, object_detail)
+               VALUES (new.id, new.subject, new.predicate, new.object_detail);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS ltm_fts_ad AFTER DELETE ON long_term_memory BEGIN
+               INSERT INTO long_term_memory_fts (long_term_memory_fts, rowid, subject, predicate, object_detail)
+               VALUES ('delete', old.id, old.subject, old.predicate, old.object_detail);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS ltm_fts_au AFTER UPDATE ON long_term_memory BEGIN
+               INSERT INTO long_term_memory_fts (long_term_memory_fts, rowid, subject, predicate, object_detail)
+               VALUES ('delete', old.id, old.subject, old.predicate, old.object_detail);
+               INSERT INTO long_term_memory_fts (rowid, subject, predicate, object_detail)
+               VALUES (new.id, new.subject, new.predicate, new.object_detail);
+           END""",
+        # A már meglévő tények beindexelése
+        "INSERT INTO long_term_memory_fts (long_term_memory_fts) VALUES ('rebuild')",
+    ]),
+    (3, "Embedding gyorsítótár (modell + sha256(szöveg) kulcs)", [
+        """CREATE TABLE IF NOT EXISTS embedding_cache (
+               model TEXT NOT NULL,
+               text_hash TEXT NOT NULL,
+               dim INTEGER NOT NULL,
+               vector BLOB NOT NULL,
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (model, text_hash)
+           ) WITHOUT ROWID""",
+    ]),
+    (4, "Index a beszélgetés-előzményekhez (/api/chat mód)", [
+        "CREATE INDEX IF NOT EXISTS idx_message_chat ON message (chat_id, id)",
+    ]),
+    (5, "URL-kulcsos oldaltár feltételes újratöltéshez, tartalom-hash szerinti deduplikációval", [
+        # A kinyert szöveg a nyers oldal sha256-ja szerint egyszer tárolódik (tükrök, követőparaméteres URL-ek)
+        """CREATE TABLE IF NOT EXISTS page_content (
+               content_hash TEXT PRIMARY KEY,
+               text TEXT NOT NULL,
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+           ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS scraped_pages (
+               url TEXT PRIMARY KEY,
+               etag TEXT,
+               last_modified TEXT,
+               content_hash TEXT NOT NULL,
+               fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
+           ) WITHOUT ROWID""",
+        # Árva tartalmak takarítása / régi oldalak törlése
+        "CREATE INDEX IF NOT EXISTS idx_scraped_pages_hash ON scraped_pages (content_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_scraped_pages_fetched ON scraped_pages (fetched_at)",
+    ]),
+]
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+from core.logger import get_logger
+from core.scraper import scraper
+from core.scrape_scheduler import scrape_scheduler, HostSkipped
+from core.singleflight import page_flight
+from core.write_queue import write_queue
+from core.background import BackgroundTasks
+
+log = get_logger("page_store")
+
+class PageStore:
+    """URL-kulcsos oldaltár a letöltött és feldolgozott oldalakhoz (a lekérdezés-kulcsos
+    search_cache-től független), így egy népszerű forrást minden lekérdezés közösen használ.
+
+    - fresh_seconds-on belül hálózat nélkül szolgál ki.
+    - Utána feltételes GET (ETag / Last-Modified); 304 esetén a tárolt szöveg marad.
+    - A kinyert szöveg a nyers oldal sha256-ja szerint egyszer tárolódik: ha az új letöltés
+      tartalma már ismert (változatlan oldal validátorok nélkül, tükör URL), nincs újabb parse.
+    - Letöltési hiba esetén a régi (lejárt) szöveg is jobb a semminél.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+        self.fresh_seconds = 3600
+        self.max_age = 14 * 86400
+        self.compaction_interval = 3600
+        self.tasks = BackgroundTasks("page_store")
+        self.stats = {"fresh_hit": 0, "not_modified": 0, "dedup": 0, "fetched": 0,
+                      "stale_fallback": 0, "host_skipped": 0, "failed": 0, "purged": 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import DBManager
+            self._db = DBManager()
+        return self._db
+
+    def configure(self, store_cfg: dict, db=None):
+        if db is not None:
+            self._db = db
+        self.fresh_seconds = store_cfg.get("fresh_seconds", self.fresh_seconds)
+        self.max_age = store_cfg.get("max_age_days", self.max_age / 86400) * 86400
+        self.compaction_interval = store_cfg.get("compaction_interval_seconds", self.compaction_interval)
+
+    async def get_text(self, client, url: str):
+        """Az oldal szövege (tárból vagy letöltve), None ha nem elérhető."""
+        # Ugyanarra az URL-re egyszerre csak egy letöltés fut (több lekérdezés találatai között is)
+        return await page_flight.do(url, lambda: self._get_text(client, url))
+
+    async def _get_text(self, client, url: str):
+        row = None
+        try:
+            row = await asyncio.to_thread(self.db.get_scraped_page, url)
+        except Exception as e:
+            log.error(f"Oldaltár olvasási hiba ({url}): {e}")
+
+        etag = last_modified = stored_hash = stored_text = None
+        if row:
+            etag, last_modified, stored_hash, age, stored_text = row
+            if stored_text is not None and age is not None and age < self.fresh_seconds:
+                self.stats["fresh_hit"] += 1
+                return stored_text
+            if stored_text is None:
+                # A tartalom sor hiányzik: a validátorokkal nem kérhetünk 304-et
+                etag = last_modified = None
+
+        try:
+            # Hostonkénti limit + késleltetés mérés; a krónikusan lassú hostokat ki sem várjuk
+            async with scrape_scheduler.host(url) as outcome:
+                page = await scraper.download(client, url, etag=etag, last_modified=last_modified)
+                if page is None:
+                    # Nem 200/304 válasz vagy nem HTML tartalom: a host hibájaként számít
+                    outcome["ok"] = False
+        except HostSkipped:
+            self.stats["host_skipped"] += 1
+            page = None
+        except Exception as e:
+            log.error(f"Scrape hiba ({url}): {e}")
+            page = None
+
+        if page is None:
+            # Hiba vagy kihagyott host: a régi (lejárt) szöveg is jobb a semminél
+            if stored_text is not None:
+                self.stats["stale_fallback"] += 1
+                return stored_text
+            self.stats["failed"] += 1
+            return None
+
+        if page["status"] == 304:
+            self.stats["not_modified"] += 1
+            self._write("touch_scraped_page", url, page["etag"], page["last_modified"])
+            return stored_text
+
+        content_hash = hashlib.sha256(page["body"]).hexdigest()
+        if content_hash == stored_hash and stored_text is not None:
+            text = stored_text
+        else:
+            text = await asyncio.to_thread(self.db.get_page_text, content_hash)
+        if text is not None:
+            self.stats["dedup"] += 1
+        else:
+            text = await scraper.extract(page)
+            self.stats["fetched"] += 1
+
+        self._write("save_scraped_page", url, page["etag"], page["last_modified"], content_hash, text)
+        return text
+
+    def _write(self, method: str, *args):
+        """Háttérben ír (write-behind): a keresés válasza nem vár a batch véglegesítésére."""
+        async def run():
+            try:
+                await write_queue.write(method, *args)
+            except Exception as e:
+                log.error(f"Oldaltár írási hiba ({method}): {e}")
+
+        self.tasks.spawn(run())
+
+    async def compaction_loop(self):
+        """Periodikus takarítás: a max_age_days óta nem frissített oldalak és az árva tartalmak törlése."""
+        while True:
+            try:
+                purged = await write_queue.write("purge_scraped_pages", self.max_age)
+                self.stats["purged"] += purged or 0
+                if purged:
+                    log.info(f"Oldaltár takarítás: {purged} régi oldal törölve.")
+            except Exception as e:
+                log.error(f"Oldaltár takarítási hiba: {e}")
+            await asyncio.sleep(self.compaction_interval)
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+page_store = PageStore()
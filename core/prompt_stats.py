@@ -0,0 +1,56 @@
+from core.logger import get_logger
+
+log = get_logger("prompt_cache")
+
+class PromptCacheMeter:
+    """Mérési mód a prompt-cache hatékonyságához az Ollama válasz-statisztikáiból.
+
+    A prompt_eval_count csak az újonnan kiértékelt prompt tokeneket számolja;
+    a teljes prompthosszt a 'context' tömbből (context_tokens - eval_count) kapjuk,
+    a különbség az Ollama által újrahasznosított (cache-elt) tokenek száma.
+
+    A /api/chat nem ad 'context' tömböt (chat mód), ott a teljes prompthossz nem ismert:
+    ezek a hívások "mérhetetlen"-ként számolódnak, és nem torzítják a cache arányt.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+        self.prompt_eval_ms = 0.0
+        self.unmeasured_calls = 0
+
+    def record(self, stats: dict, label: str = ""):
+        evaluated = stats.get("prompt_eval_count")
+        if evaluated is None:
+            return None
+        if "context_tokens" not in stats:
+            self.unmeasured_calls += 1
+            log.debug(f"[{label}] Prompt cache nem mérhető (nincs 'context', pl. /api/chat), kiértékelt: {evaluated}")
+            return None
+        total = stats.get("context_tokens", 0) - stats.get("eval_count", 0)
+        total = max(total, evaluated)
+        cached = total - evaluated
+        eval_ms = stats.get("prompt_eval_duration", 0) / 1e6
+
+        self.calls += 1
+        self.prompt_tokens += total
+        self.evaluated_tokens += evaluated
+        self.prompt_eval_ms += eval_ms
+
+        ratio = cached / total if total else 0.0
+        log.info(f"[{label}] Prompt: {total} token | kiértékelt: {evaluated} | "
+                 f"cache-ből: {cached} ({ratio:.0%}) | prompt eval: {eval_ms:.0f} ms")
+        return {"prompt_tokens": total, "evaluated": evaluated, "cached": cached}
+
+    def summary(self) -> dict:
+        cached = self.prompt_tokens - self.evaluated_tokens
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "evaluated_tokens": self.evaluated_tokens,
+            "cached_tokens": cached,
+            "cache_ratio": round(cached / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "avg_prompt_eval_ms": round(self.prompt_eval_ms / self.calls, 1) if self.calls else 0.0,
+            "unmeasured_calls": self.unmeasured_calls,
+        }
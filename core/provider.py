@@ -1,14 +1,25 @@
-import httpx
 import json
+import asyncio
+import hashlib
+from core.http_client import http_clients
+from core.embedding_cache import embedding_cache
+from core.tracing import tracer
+from core.llm_scheduler import llm_scheduler
+from core.singleflight import llm_flight
+from core.logger import get_logger
+
+log = get_logger("provider")
 
 class LLMProvider:
-    def __init__(self, base_url: str, default_model: str):
+    def __init__(self, base_url: str, default_model: str, keep_alive=None, coalesce_max_temp=0.2):
         self.base_url = base_url.rstrip('/')
         self.default_model = default_model
+        # Meddig tartsa az Ollama a modellt (és a KV-cache-t) a memóriában, pl. "30m"
+        self.keep_alive = keep_alive
+        # Eddig a hőmérsékletig az azonos, egyszerre futó hívások összevonódnak (single-flight)
+        self.coalesce_max_temp = coalesce_max_temp
 
-    async def generate_response(self, prompt: str, system_prompt: str = "", temp: float = 0.7, model_override: str = None):
-        target_model = model_override or self.default_model
-        
+    def _build_payload(self, prompt: str, system_prompt: str, temp: float, target_model: str, stream: bool):
         # Gemma-Native formátum a System prompt kényszerítésére
         formatted_prompt = (
             f"<start_of_turn>system\n{system_prompt}<end_of_turn>\n"
@@ -19,38 +30,187 @@ class LLMProvider:
         payload = {
             "model": target_model,
             "prompt": formatted_prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temp,
                 "stop": ["<end_of_turn>", "user:", "Asszisztens:"]
             }
         }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _build_chat_payload(self, messages: list, temp: float, target_model: str, stream: bool):
+        # A /api/chat a modell saját chat-sablonját használja, nem kell kézzel formázni
+        payload = {
+            "model": target_model,
+            "messages": messages,
+            "stream": stream,
+            "options": {"temperature": temp}
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    @staticmethod
+    def _collect_stats(data: dict, stats: dict):
+        """Az Ollama válasz teljesítmény-mezőinek átmásolása a hívó 'stats' dict-jébe."""
+        if stats is None:
+            return
+        for key in ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+                    "load_duration", "total_duration"):
+            if key in data:
+                stats[key] = data[key]
+        # A /api/generate 'context' tömbje a teljes (prompt + válasz) tokensorozat
+        if isinstance(data.get("context"), list):
+            stats["context_tokens"] = len(data["context"])
+
+    @staticmethod
+    def _extract_text(data: dict) -> str:
+        """A /api/generate ('response') és a /api/chat ('message.content') válaszformátuma is."""
+        if "message" in data:
+            return (data.get("message") or {}).get("content", "")
+        return data.get("response", "")
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            try:
-                url = f"{self.base_url}/api/generate"
-                response = await client.post(url, json=payload)
+    async def _post(self, endpoint: str, payload: dict, target_model: str, stats: dict = None,
+                    priority: str = "interactive"):
+        client = http_clients.get("ollama")
+        url = f"{self.base_url}{endpoint}"
+
+        async def request():
+            response = await client.post(url, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            # A scheduler adja a slotot (modellenkénti limit, prioritás, határidő)
+            data = await llm_scheduler.run(target_model, request, priority=priority)
+            self._collect_stats(data, stats)
+            tracer.record_llm(target_model, data)
+            return self._extract_text(data) or 'Üres válasz érkezett.'
+        except Exception as e:
+            return f"Hiba az Ollama elérésekor ({target_model}): {str(e)}"
+
+    async def _stream(self, endpoint: str, payload: dict, target_model: str, stats: dict = None,
+                      priority: str = "interactive"):
+        client = http_clients.get("ollama")
+        try:
+            url = f"{self.base_url}{endpoint}"
+            async with llm_scheduler.slot(target_model, priority), \
+                       client.stream("POST", url, json=payload) as response:
                 response.raise_for_status()
-                data = response.json()
-                return data.get('response', 'Üres válasz érkezett.')
-            except Exception as e:
-                return f"Hiba az Ollama elérésekor ({target_model}): {str(e)}"
+                # Az Ollama soronként egy JSON objektumot küld (NDJSON)
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    token = self._extract_text(data)
+                    if token:
+                        yield token
+                    if data.get('done'):
+                        self._collect_stats(data, stats)
+                        tracer.record_llm(target_model, data)
+                        break
+        except Exception as e:
+            yield f"Hiba az Ollama elérésekor ({target_model}): {str(e)}"
+
+    async def generate_response(self, prompt: str, system_prompt: str = "", temp: float = 0.7,
+                                model_override: str = None, stats: dict = None, priority: str = "interactive"):
+        target_model = model_override or self.default_model
+        payload = self._build_payload(prompt, system_prompt, temp, target_model, stream=False)
+        if self.coalesce_max_temp is None or temp > self.coalesce_max_temp:
+            return await self._post("/api/generate", payload, target_model, stats, priority)
+
+        # Determinisztikus (alacsony hőmérsékletű) hívás: az azonos, párhuzamos kérések
+        # (pl. router, RAG tisztító) egyetlen Ollama hívás eredményén osztoznak
+        async def shared_call():
+            call_stats = {}
+            text = await self._post("/api/generate", payload, target_model, call_stats, priority)
+            return text, call_stats
+
+        key = (target_model, hashlib.sha256(payload["prompt"].encode("utf-8")).hexdigest(), temp)
+        text, call_stats = await llm_flight.do(key, shared_call)
+        if stats is not None:
+            stats.update(call_stats)
+        return text
+
+    async def stream_response(self, prompt: str, system_prompt: str = "", temp: float = 0.7,
+                              model_override: str = None, stats: dict = None, priority: str = "interactive"):
+        """Token-szintű stream az Ollama-ból (stream: true). Szövegdarabokat yield-el."""
+        target_model = model_override or self.default_model
+        payload = self._build_payload(prompt, system_prompt, temp, target_model, stream=True)
+        async for token in self._stream("/api/generate", payload, target_model, stats, priority):
+            yield token
+
+    async def chat_response(self, messages: list, temp: float = 0.7,
+                            model_override: str = None, stats: dict = None, priority: str = "interactive"):
+        """Strukturált üzenet-előzmény küldése a /api/chat végpontra."""
+        target_model = model_override or self.default_model
+        payload = self._build_chat_payload(messages, temp, target_model, stream=False)
+        return await self._post("/api/chat", payload, target_model, stats, priority)
+
+    async def stream_chat(self, messages: list, temp: float = 0.7,
+                          model_override: str = None, stats: dict = None, priority: str = "interactive"):
+        """A chat_response streamelt párja."""
+        target_model = model_override or self.default_model
+        payload = self._build_chat_payload(messages, temp, target_model, stream=True)
+        async for token in self._stream("/api/chat", payload, target_model, stats, priority):
+            yield token
 
     async def generate_embedding(self, text: str, model: str = "qwen3-embedding:4b"):
         """Ez a hiányzó láncszem a memóriához"""
-        payload = {
-            "model": model,
-            "prompt": text
-        }
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                url = f"{self.base_url}/api/embeddings"
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                # Az Ollama az 'embedding' kulcs alatt adja vissza a listát
-                return data.get('embedding')
-            except Exception as e:
-                print(f"Embedding hiba: {str(e)}")
-                return None
\ No newline at end of file
+        vectors = await self.generate_embeddings([text], model=model)
+        return vectors[0] if vectors else None
+
+    async def generate_embeddings(self, texts: list, model: str = "qwen3-embedding:4b",
+                                  batch_size: int = 32, concurrency: int = 4):
+        """Batch embedding az Ollama /api/embed végpontjával, content-hash cache-sel.
+
+        A bemenettel azonos sorrendű listát ad vissza; a sikertelen elemek helyén None áll.
+        Egy kérés 'batch_size' szöveget visz, egyszerre legfeljebb 'concurrency' kérés fut.
+        """
+        if not texts:
+            return []
+
+        cached = await embedding_cache.get_many(model, texts)
+        results = [cached.get(embedding_cache.text_hash(t)) for t in texts]
+
+        # Csak a hiányzó, egyedi szövegeket küldjük el
+        missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+        if missing:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def embed_batch(batch):
+                async with semaphore:
+                    return batch, await self._embed_request(batch, model)
+
+            batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+            fresh = {}
+            for batch, vectors in await asyncio.gather(*(embed_batch(b) for b in batches)):
+                if vectors:
+                    fresh.update(zip(batch, vectors))
+
+            await embedding_cache.put_many(model, list(fresh.items()))
+            results = [r if r is not None else fresh.get(t) for t, r in zip(texts, results)]
+
+        return results
+
+    async def _embed_request(self, batch: list, model: str):
+        client = http_clients.get("ollama")
+        try:
+            url = f"{self.base_url}/api/embed"
+            response = await client.post(url, json={"model": model, "input": batch})
+            if response.status_code == 404:
+                # Régebbi Ollama: nincs /api/embed, szövegenként a régi végpont
+                return [await self._legacy_embedding(client, text, model) for text in batch]
+            response.raise_for_status()
+            # Az Ollama az 'embeddings' kulcs alatt adja vissza a listák listáját
+            return response.json().get('embeddings')
+        except Exception as e:
+            log.warning(f"Embedding hiba ({model}, {len(batch)} szöveg): {e}")
+            return None
+
+    async def _legacy_embedding(self, client, text: str, model: str):
+        response = await client.post(f"{self.base_url}/api/embeddings", json={"model": model, "prompt": text})
+        response.raise_for_status()
+        return response.json().get('embedding')
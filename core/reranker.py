@@ -1,57 +1,173 @@
+import os
 import torch
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
+# local: az eredeti PyTorch modell (GPU-n fp16, CPU-n fp32)
+# int8:  PyTorch dinamikus int8 kvantálás (csak CPU, Linear rétegek)
+# onnx:  ONNX Runtime CPU-n (opcionálisan int8-ra kvantált ONNX gráffal)
+BACKENDS = ("local", "int8", "onnx")
+
 class Reranker:
     def __init__(self, config):
         self.mode = config.get("mode", "local")
         self.model_name = config.get("model_name", "Qwen/Qwen3-Reranker-0.6B")
         self.device = config.get("device", "cuda") if torch.cuda.is_available() else "cpu"
-        
-        if self.mode == "local":
-            print(f"--- Reranker: Modell betöltése ({self.device}): {self.model_name} ---")
+        self.batch_size = config.get("batch_size", 16)
+        self.intra_op_threads = config.get("intra_op_threads", 0)  # 0 = a könyvtár alapértéke
+        self.session = None
+        # Saját, egyszálú executor: a forward pass sosem fut az event loop szálán,
+        # és a párhuzamos kérések nem versenyeznek ugyanazért a modellért
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+        if self.mode in ("int8", "onnx"):
+            # Ezek CPU backendek, GPU-n a 'local' mód a gyorsabb
+            self.device = "cpu"
+            if self.intra_op_threads:
+                torch.set_num_threads(self.intra_op_threads)
+
+        if self.mode in BACKENDS:
+            print(f"--- Reranker: Modell betöltése ({self.device}, {self.mode}): {self.model_name} ---")
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            
+
             from transformers import AutoConfig
-            config = AutoConfig.from_pretrained(self.model_name, trust_remote_code=True)
-            
-            
+            model_config = AutoConfig.from_pretrained(self.model_name, trust_remote_code=True)
+
+
             # FONTOS: trust_remote_code=True és a megfelelő architektúra kényszerítése
             # Megpróbáljuk kényszeríteni az architektúrát
             self.model = AutoModelForSequenceClassification.from_pretrained(
                 self.model_name,
-                config=config,
+                config=model_config,
                 dtype=torch.float16 if self.device == "cuda" else torch.float32,
                 trust_remote_code=True,
                 device_map=self.device
             )
             self.model.eval()
 
+            # Batch-hez kell pad token (a Qwen tokenizerben nincs mindig), és a modellnek
+            # tudnia kell róla, hogy az utolsó valódi tokent pontozza
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.model.config.pad_token_id = self.tokenizer.pad_token_id
+
+            if self.mode == "int8":
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                print("--- Reranker: int8 dinamikus kvantálás kész ---")
+            elif self.mode == "onnx":
+                self._load_onnx(config)
+
+    def _load_onnx(self, config):
+        """ONNX modell betöltése, szükség esetén egyszeri exporttal (és int8 kvantálással)."""
+        import onnxruntime as ort
+
+        onnx_path = config.get("onnx_path", os.path.join("models", "reranker.onnx"))
+        if not os.path.exists(onnx_path):
+            self._export_onnx(onnx_path)
+
+        if config.get("onnx_quantize", True):
+            quant_path = onnx_path.replace(".onnx", ".int8.onnx")
+            if not os.path.exists(quant_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(onnx_path, quant_path, weight_type=QuantType.QInt8)
+                print(f"--- Reranker: ONNX int8 kvantálás kész: {quant_path} ---")
+            onnx_path = quant_path
+
+        options = ort.SessionOptions()
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._onnx_inputs = {i.name for i in self.session.get_inputs()}
+        # A PyTorch modellre ezután nincs szükség, elengedjük a memóriát
+        self.model = None
+        print(f"--- Reranker: ONNX session aktív ({onnx_path}) ---")
+
+    def _export_onnx(self, onnx_path):
+        os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+        sample = self.tokenizer(["query"], ["passage"], return_tensors='pt', padding=True)
+        dynamic = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                self.model,
+                (sample["input_ids"], sample["attention_mask"]),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "logits": {0: "batch"}},
+                opset_version=17,
+            )
+        print(f"--- Reranker: ONNX export kész: {onnx_path} ---")
+
+    def _forward(self, inputs):
+        """Logitok (n, C) a kiválasztott backenddel."""
+        if self.session is not None:
+            feed = {k: v.cpu().numpy() for k, v in inputs.items() if k in self._onnx_inputs}
+            return torch.from_numpy(self.session.run(["logits"], feed)[0])
+        return self.model(**inputs).logits
+
     def get_local_score(self, query, passage):
-        if self.mode != "local":
+        if self.mode not in BACKENDS:
             return 0.0
-            
+
         with torch.no_grad():
             inputs = self.tokenizer(
-                query, 
-                passage, 
-                return_tensors='pt', 
-                padding=True, 
-                truncation=True, 
+                query,
+                passage,
+                return_tensors='pt',
+                padding=True,
+                truncation=True,
                 max_length=512
             ).to(self.device)
-            
-            outputs = self.model(**inputs)
-            
+
             # Mivel 2 elemet kaptunk, megnézzük a logits dimenzióját
-            logits = outputs.logits[0] 
-            
+            logits = self._forward(inputs)[0]
+
             if logits.dim() > 0 and len(logits) > 1:
                 # Ha 2 elemű (Softmax/Cross-Entropy), a második elem a relevancia (index 1)
                 # Alkalmazunk egy Softmax-ot, hogy valószínűséget kapjunk
                 probs = torch.softmax(logits, dim=0)
-                score = probs[1].cpu().item() 
+                score = probs[1].cpu().item()
             else:
                 # Ha csak 1 elemű (Sigmoid), marad az eredeti
                 score = torch.sigmoid(logits).cpu().item()
-                
-            return score
\ No newline at end of file
+
+            return score
+
+    def _logits_to_scores(self, logits):
+        """(n, C) logitokból relevancia-pontszámok, ugyanazzal a logikával, mint a get_local_score."""
+        if logits.dim() > 1 and logits.shape[-1] > 1:
+            return torch.softmax(logits, dim=-1)[:, 1].float().cpu().tolist()
+        return torch.sigmoid(logits.reshape(-1)).float().cpu().tolist()
+
+    def get_local_scores(self, query, passages):
+        """Batch pontozás: az összes (query, passage) pár egy tokenizálás + forward pass.
+
+        A padding dinamikus (a batch leghosszabb eleméig), a nagyon sok passage-t
+        'batch_size' méretű darabokban futtatjuk a memória kímélése miatt.
+        """
+        if self.mode not in BACKENDS or not passages:
+            return [0.0] * len(passages)
+
+        scores = []
+        with torch.no_grad():
+            for i in range(0, len(passages), self.batch_size):
+                chunk = passages[i:i + self.batch_size]
+                inputs = self.tokenizer(
+                    [query] * len(chunk),
+                    chunk,
+                    return_tensors='pt',
+                    padding=True,
+                    truncation=True,
+                    max_length=512
+                ).to(self.device)
+                scores.extend(self._logits_to_scores(self._forward(inputs)))
+        return scores
+
+    async def score_batch(self, query, passages):
+        """Async belépési pont: a batch pontozás a dedikált executorban fut."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.get_local_scores, query, list(passages))
@@ -0,0 +1,183 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from core.logger import get_logger
+
+log = get_logger("scrape_scheduler")
+
+class HostSkipped(Exception):
+    """A host a mért késleltetése/hibái miatt átmenetileg ki van hagyva."""
+
+class HostStats:
+    __slots__ = ("ewma_ms", "samples", "failures", "consecutive_failures", "skipped", "skipped_until")
+
+    def __init__(self):
+        self.ewma_ms = None
+        self.samples = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.skipped = 0
+        self.skipped_until = 0.0
+
+class ScrapeScheduler:
+    """Scrape ütemező: hostonkénti párhuzamossági limit, a scrape fázis teljes határideje,
+    és domainenkénti késleltetés-statisztika a krónikusan lassú hostok kihagyásához.
+
+    - host(url): a tényleges letöltés köré; hostonként legfeljebb per_host_limit fut egyszerre,
+      és méri a késleltetést (EWMA). Ha a host lassú (ewma > slow_ms legalább min_samples
+      mintából) vagy egymás után max_failures-ször hibázott, skip_seconds-ig HostSkipped-et dob;
+      utána egy próbálkozás újra mérhet.
+    - gather(...): a letöltések a deadline-ig futnak; ami addig nem készült el, annak helyén None
+      áll (a hívó a SearXNG snippetet használja), a letöltés pedig háttérben befejeződik
+      (feltölti az oldaltárat és a statisztikát).
+    """
+
+    def __init__(self):
+        self.per_host_limit = 2
+        self.deadline = 3.0
+        self.slow_ms = 2500
+        self.min_samples = 3
+        self.max_failures = 3
+        self.skip_seconds = 600
+        self.partial_ttl = 300
+        self.alpha = 0.3
+        self._hosts = {}
+        self._semaphores = {}
+        self._background = set()
+        self.stats = {"scheduled": 0, "completed": 0, "deadline_missed": 0, "skipped": 0}
+
+    def configure(self, sched_cfg: dict):
+        self.per_host_limit = sched_cfg.get("per_host_limit", self.per_host_limit)
+        self.deadline = sched_cfg.get("deadline_seconds", self.deadline)
+        self.slow_ms = sched_cfg.get("slow_host_ms", self.slow_ms)
+        self.min_samples = sched_cfg.get("slow_min_samples", self.min_samples)
+        self.max_failures = sched_cfg.get("max_consecutive_failures", self.max_failures)
+        self.skip_seconds = sched_cfg.get("skip_seconds", self.skip_seconds)
+        self.partial_ttl = sched_cfg.get("partial_ttl_seconds", self.partial_ttl)
+        self._semaphores.clear()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return (urlsplit(url or "").hostname or "").lower()
+
+    def _host_stats(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats()
+        return stats
+
+    def _record(self, host: str, elapsed_ms: float, ok: bool):
+        stats = self._host_stats(host)
+        stats.samples += 1
+        stats.ewma_ms = elapsed_ms if stats.ewma_ms is None else (
+            self.alpha * elapsed_ms + (1 - self.alpha) * stats.ewma_ms
+        )
+        if ok:
+            stats.consecutive_failures = 0
+        else:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+
+        too_slow = stats.samples >= self.min_samples and stats.ewma_ms > self.slow_ms
+        if too_slow or stats.consecutive_failures >= self.max_failures:
+            stats.skipped_until = time.monotonic() + self.skip_seconds
+            reason = f"átlag {stats.ewma_ms:.0f} ms" if too_slow else f"{stats.consecutive_failures} hiba egymás után"
+            log.warning(f"Lassú/hibás host kihagyva {self.skip_seconds}s-ig: {host} ({reason})")
+
+    @asynccontextmanager
+    async def host(self, url: str):
+        """Hostonkénti slot a letöltéshez; a blokk ideje a host késleltetés-statisztikájába kerül.
+        A hívó jelezheti a hibát (pl. nem 200) a yieldelt dict 'ok' mezőjével."""
+        host = self.host_of(url)
+        stats = self._host_stats(host)
+        if stats.skipped_until:
+            if time.monotonic() < stats.skipped_until:
+                stats.skipped += 1
+                self.stats["skipped"] += 1
+                raise HostSkipped(host)
+            # Lejárt a kihagyás: a következő egyetlen mérés dönt (gyors -> újra használható, lassú/hiba -> újra kimarad)
+            stats.skipped_until = 0.0
+            stats.ewma_ms = None
+            stats.consecutive_failures = self.max_failures - 1
+
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        async with semaphore:
+            outcome = {"ok": True}
+            cancelled = False
+            t0 = time.perf_counter()
+            try:
+                yield outcome
+            except asyncio.CancelledError:
+                # A megszakított letöltés semmit sem mond a hostról
+                cancelled = True
+                raise
+            except Exception:
+                outcome["ok"] = False
+                raise
+            finally:
+                if not cancelled:
+                    self._record(host, (time.perf_counter() - t0) * 1000, outcome["ok"])
+
+    async def gather(self, fns: list, deadline: float = None):
+        """A coroutine-gyárak (fn() -> coroutine) párhuzamos futtatása közös határidővel.
+
+        (eredmények, lekésettek száma); az eredmények sorrendje a bemenetét követi,
+        ami nem végzett időben vagy hibázott, annak helyén None áll.
+        """
+        if not fns:
+            return [], 0
+        deadline = self.deadline if deadline is None else deadline
+        tasks = [asyncio.ensure_future(fn()) for fn in fns]
+        self.stats["scheduled"] += len(tasks)
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+        except asyncio.CancelledError:
+            # A keresést lemondták (pl. spekulatív keresés INTERNAL döntés után): a letöltéseket
+            # is leállítjuk (a page_flight csak akkor állítja le a letöltést, ha másnak sem kell)
+            for task in tasks:
+                task.cancel()
+            raise
+
+        # Nem szakítjuk meg őket: a háttérben befejeződve feltöltik az oldaltárat
+        self._detach(pending)
+        if pending:
+            self.stats["deadline_missed"] += len(pending)
+            log.info(f"Scrape határidő ({deadline}s): {len(done)}/{len(tasks)} oldal készült el időben.")
+
+        results = []
+        for task in tasks:
+            if task in done and not task.cancelled() and task.exception() is None:
+                results.append(task.result())
+                self.stats["completed"] += 1
+            else:
+                results.append(None)
+        return results, len(pending)
+
+    def _detach(self, tasks):
+        for task in tasks:
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+
+    def _background_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        hosts = {
+            host: {
+                "ewma_ms": round(s.ewma_ms, 1) if s.ewma_ms is not None else None,
+                "samples": s.samples,
+                "failures": s.failures,
+                "skipped": s.skipped,
+                "skipped_for_s": max(0, round(s.skipped_until - now)),
+            }
+            for host, s in sorted(self._hosts.items(), key=lambda kv: -(kv[1].ewma_ms or 0))
+        }
+        return {**self.stats, "background": len(self._background), "hosts": hosts}
+
+scrape_scheduler = ScrapeScheduler()
@@ -0,0 +1,268 @@
+import re
+import asyncio
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from core.logger import get_logger
+
+log = get_logger("scraper")
+
+# Ezek a részek sosem tartalmaznak érdemi szöveget
+DROP_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form",
+             "nav", "footer", "header", "aside"]
+# Fő tartalom jelöltek (readability-szerű egyszerűsítés: ha van elég szöveg benne, csak ezt vesszük)
+MAIN_SELECTORS = ["article", "main", "[role=main]", "#content", ".content", "#main"]
+# Ugyanez XPath-ként (az lxml cssselect külön csomag lenne)
+MAIN_XPATHS = ["//article", "//main", "//*[@role='main']", "//*[@id='content']",
+               "//*[contains(concat(' ', normalize-space(@class), ' '), ' content ')]", "//*[@id='main']"]
+ALLOWED_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+_WS = re.compile(r"\s+")
+# Nagy, szöveg nélküli blokkok kivágása még a parse előtt (kevesebb munka minden backendnek)
+_PRESTRIP = re.compile(r"<!--.*?-->|<(script|style|noscript|template|svg)\b[^>]*>.*?</\1\s*>", re.S | re.I)
+
+def _available_backends() -> list:
+    backends = []
+    try:
+        import selectolax.parser  # noqa: F401
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends += ["stdlib", "bs4"]
+    return backends
+
+BACKENDS = _available_backends()
+
+def _collect(strings, limit: int) -> str:
+    """Szövegdarabok összefűzése, amíg össze nem jön a limit (a többit fölösleges bejárni)."""
+    parts, size = [], 0
+    for chunk in strings:
+        chunk = chunk.strip()
+        if chunk:
+            parts.append(chunk)
+            size += len(chunk) + 1
+            if size >= limit:
+                break
+    return " ".join(parts)
+
+def _extract_selectolax(html: str, min_main_chars: int, limit: int) -> str:
+    from selectolax.parser import HTMLParser
+    tree = HTMLParser(html)
+    tree.strip_tags(DROP_TAGS)
+    for selector in MAIN_SELECTORS:
+        node = tree.css_first(selector)
+        if node is not None:
+            text = node.text(separator=" ", strip=True)
+            if len(text) >= min_main_chars:
+                return text
+    root = tree.body or tree.root
+    return root.text(separator=" ", strip=True) if root is not None else ""
+
+def _extract_lxml(html: str, min_main_chars: int, limit: int) -> str:
+    from lxml import html as lxml_html
+    doc = lxml_html.document_fromstring(html)
+    for el in doc.xpath("|".join(f"//{tag}" for tag in DROP_TAGS)):
+        el.drop_tree()
+    for xpath in MAIN_XPATHS:
+        found = doc.xpath(xpath)
+        if found:
+            text = _collect(found[0].itertext(), max(limit, min_main_chars))
+            if len(text) >= min_main_chars:
+                return text
+    body = doc.find("body")
+    return _collect((body if body is not None else doc).itertext(), limit)
+
+class _StreamExtractor(HTMLParser):
+    """Fa építése nélküli kinyerés (stdlib): a kihagyandó elemeken belüli szöveget eldobja,
+    az első elég hosszú fő tartalom blokk (article/main/...) szövegét külön gyűjti, és ha
+    abból megvan a limit, a parse-t azonnal abbahagyja."""
+
+    MAIN_TAGS = ("article", "main")
+    MAIN_IDS = ("content", "main")
+
+    class Done(Exception):
+        pass
+
+    def __init__(self, min_main_chars: int, limit: int):
+        super().__init__()
+        self.min_main_chars = min_main_chars
+        self.limit = limit
+        self.skip = 0
+        self.body_parts, self.body_size = [], 0
+        self.main_parts, self.main_size = [], 0
+        self.main_tag, self.main_level = None, 0
+        self.main_text = None
+
+    @staticmethod
+    def _is_main(tag, attrs) -> bool:
+        if tag in _StreamExtractor.MAIN_TAGS:
+            return True
+        attrs = dict(attrs)
+        classes = attrs.get("class") or ""
+        if isinstance(classes, str):
+            classes = classes.split()
+        return attrs.get("role") == "main" or attrs.get("id") in _StreamExtractor.MAIN_IDS or "content" in classes
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_TAGS:
+            self.skip += 1
+        elif self.main_tag is None:
+            if self.main_text is None and not self.skip and self._is_main(tag, attrs):
+                self.main_tag, self.main_level = tag, 1
+        elif tag == self.main_tag:
+            self.main_level += 1
+
+    def handle_endtag(self, tag):
+        if tag in DROP_TAGS:
+            self.skip = max(self.skip - 1, 0)
+        elif tag == self.main_tag:
+            self.main_level -= 1
+            if self.main_level == 0:
+                self.main_tag = None
+                if self.main_size >= self.min_main_chars:
+                    self.main_text = " ".join(self.main_parts)
+                    raise self.Done()
+                self.main_parts, self.main_size = [], 0
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        data = data.strip()
+        if not data:
+            return
+        if self.body_size < self.limit:
+            self.body_parts.append(data)
+            self.body_size += len(data) + 1
+        if self.main_tag is not None:
+            self.main_parts.append(data)
+            self.main_size += len(data) + 1
+            if self.main_size >= max(self.limit, self.min_main_chars):
+                self.main_text = " ".join(self.main_parts)
+                raise self.Done()
+
+def _extract_stdlib(html: str, min_main_chars: int, limit: int) -> str:
+    parser = _StreamExtractor(min_main_chars, limit)
+    try:
+        parser.feed(html)
+        parser.close()
+    except _StreamExtractor.Done:
+        pass
+    if parser.main_text is not None:
+        return parser.main_text
+    if parser.main_size >= min_main_chars:
+        # Le nem zárt fő blokk (csonkolt oldal)
+        return " ".join(parser.main_parts)
+    return " ".join(parser.body_parts)
+
+def _extract_bs4(html: str, min_main_chars: int, limit: int) -> str:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml" if "lxml" in BACKENDS else "html.parser")
+    for s in soup(DROP_TAGS):
+        s.decompose()
+    # Egyetlen bejárás a CSS szelektorok helyett (a soupsieve a teljes fán lassú)
+    is_main = lambda tag: _StreamExtractor._is_main(tag.name, tag.attrs)
+    for node in soup.find_all(is_main):
+        text = _collect(node.stripped_strings, max(limit, min_main_chars))
+        if len(text) >= min_main_chars:
+            return text
+    return _collect(soup.stripped_strings, limit)
+
+EXTRACTORS = {"selectolax": _extract_selectolax, "lxml": _extract_lxml,
+              "stdlib": _extract_stdlib, "bs4": _extract_bs4}
+
+def extract_text(html: str, max_chars: int = 3000, backend: str = None, min_main_chars: int = 500) -> str:
+    """HTML -> tiszta, összevont szóközös szöveg (legfeljebb max_chars karakter).
+
+    backend: selectolax | lxml | stdlib | bs4; None = a leggyorsabb elérhető.
+    """
+    backend = backend if backend in BACKENDS else BACKENDS[0]
+    html = _PRESTRIP.sub(" ", html)
+    text = EXTRACTORS[backend](html, min_main_chars, max_chars)
+    if not text.strip() and backend != "bs4":
+        # Hibás markup (pl. le nem zárt <nav>) miatt üres: a toleránsabb bs4 még próbálkozhat
+        text = _extract_bs4(html, min_main_chars, max_chars)
+    return _WS.sub(" ", text).strip()[:max_chars]
+
+class Scraper:
+    """Oldal letöltése streamelve, bájtkorláttal és content-type ellenőrzéssel; a CPU-igényes
+    HTML feldolgozás külön szálkészletben fut, nem az event loopon."""
+
+    def __init__(self):
+        self.max_bytes = 1_500_000
+        self.max_chars = 3000
+        self.min_main_chars = 500
+        self.backend = None
+        self.executor = None
+        self.workers = 4
+        self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+    def configure(self, scraper_cfg: dict):
+        self.max_bytes = scraper_cfg.get("max_bytes", self.max_bytes)
+        self.max_chars = scraper_cfg.get("max_chars", self.max_chars)
+        self.min_main_chars = scraper_cfg.get("min_main_chars", self.min_main_chars)
+        backend = scraper_cfg.get("parser", "auto")
+        self.backend = None if backend == "auto" else backend
+        if self.backend and self.backend not in BACKENDS:
+            log.warning(f"A(z) '{self.backend}' parser nem elérhető, marad: {BACKENDS[0]}")
+            self.backend = None
+        self.workers = scraper_cfg.get("workers", self.workers)
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scraper")
+            log.info(f"Scraper parser: {self.backend or BACKENDS[0]} ({self.workers} worker)")
+        return self.executor
+
+    async def download(self, client, url: str, etag: str = None, last_modified: str = None):
+        """Streamelt letöltés, opcionálisan feltételes fejlécekkel (If-None-Match / If-Modified-Since).
+
+        None, ha hiba/nem HTML/nem 200; különben dict: status (200 vagy 304), body (bájtok),
+        encoding, content_type, etag, last_modified.
+        """
+        headers = {"User-Agent": self.user_agent, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        async with client.stream("GET", url, follow_redirects=True, headers=headers) as resp:
+            page = {
+                "status": resp.status_code,
+                "etag": resp.headers.get("etag"),
+                "last_modified": resp.headers.get("last-modified"),
+                "content_type": resp.headers.get("content-type", "").split(";")[0].strip().lower(),
+                "body": b"",
+            }
+            if resp.status_code == 304:
+                return page
+            if resp.status_code != 200:
+                return None
+            if page["content_type"] and not page["content_type"].startswith(ALLOWED_TYPES):
+                log.info(f"Kihagyva (content-type: {page['content_type']}): {url}")
+                return None
+
+            chunks, size = [], 0
+            async for chunk in resp.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.max_bytes:
+                    # A többi nem kell: a kapcsolat a kontextuskezelő végén lezárul
+                    break
+            page["body"] = b"".join(chunks)[:self.max_bytes]
+            page["encoding"] = resp.charset_encoding or "utf-8"
+        return page
+
+    async def extract(self, page: dict) -> str:
+        """A letöltött oldal szövege; a HTML feldolgozás a szálkészletben fut."""
+        html = page["body"].decode(page.get("encoding") or "utf-8", errors="replace")
+        if page["content_type"] == "text/plain":
+            return _WS.sub(" ", html).strip()[:self.max_chars]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), extract_text, html, self.max_chars, self.backend, self.min_main_chars
+        )
+
+scraper = Scraper()
@@ -0,0 +1,174 @@
+import re
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from core.logger import get_logger
+from core.search_router import normalize_query
+from core.write_queue import write_queue
+from core.background import BackgroundTasks
+
+log = get_logger("search_cache")
+
+FRESH, STALE = "fresh", "stale"
+
+class SearchCache:
+    """Kétszintű keresési cache: korlátos memóriabeli LRU a SQLite search_cache előtt.
+
+    - TTL lekérdezés-osztályonként (pl. árfolyam/időjárás rövid, lexikális tudás hosszú).
+    - Lejárat után még stale_seconds ideig kiszolgálható (stale-while-revalidate),
+      a hívó közben háttérben frissít.
+    - Üres találatot csak memóriában, rövid ideig jegyzünk meg (negatív cache).
+    - A compaction_loop periodikusan törli a türelmi időn túl lejárt sorokat.
+    """
+
+    DEFAULT_CLASSES = {
+        "realtime": ["arfolyam", "idojaras", "tozsde", "meccs", "eredmeny", "most", "ma", "mai", "jelenleg"],
+        "news": ["hir", "hirek", "news", "legujabb", "aktualis", "tegnap"],
+        "reference": ["definicio", "jelentese", "jelent", "tortenete", "ki volt", "mi az", "wikipedia"],
+    }
+    DEFAULT_TTLS = {"realtime": 1800, "news": 3600, "default": 43200, "reference": 604800}
+
+    def __init__(self, db=None):
+        self._db = db
+        self.max_size = 512
+        self.stale_seconds = 86400
+        self.negative_ttl = 300
+        self.compaction_interval = 3600
+        self.ttls = dict(self.DEFAULT_TTLS)
+        self._classes = {}
+        self._entries = OrderedDict()  # query_hash -> (találatok, friss eddig, kiszolgálható eddig)
+        self._refreshing = set()
+        self.tasks = BackgroundTasks("search_cache")
+        self.stats = {"memory_hit": 0, "db_hit": 0, "stale_hit": 0, "negative_hit": 0, "miss": 0, "purged": 0}
+        self._compile(self.DEFAULT_CLASSES)
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import DBManager
+            self._db = DBManager()
+        return self._db
+
+    def configure(self, cache_cfg: dict, db=None):
+        if db is not None:
+            self._db = db
+        self.max_size = cache_cfg.get("memory_size", self.max_size)
+        self.stale_seconds = cache_cfg.get("stale_seconds", self.stale_seconds)
+        self.negative_ttl = cache_cfg.get("negative_ttl_seconds", self.negative_ttl)
+        self.compaction_interval = cache_cfg.get("compaction_interval_seconds", self.compaction_interval)
+        self.ttls.update(cache_cfg.get("ttl_seconds", {}) or {})
+        self._compile(cache_cfg.get("classes") or self.DEFAULT_CLASSES)
+
+    def _compile(self, classes: dict):
+        def pattern(word):
+            word = normalize_query(word)
+            # Rövid szavak csak egészben (a 'ma' ne illeszkedjen a 'magyar'-ra), a hosszabbak szótőként
+            return re.escape(word) + (r"\b" if len(word) <= 3 else "")
+
+        self._classes = {
+            name: re.compile(r"\b(" + "|".join(pattern(w) for w in words) + r")")
+            for name, words in classes.items() if words
+        }
+
+    def query_class(self, query: str) -> str:
+        normalized = normalize_query(query)
+        # Az időérzékeny osztályok élveznek elsőbbséget (a rövidebb TTL a biztonságos)
+        for name in sorted(self._classes, key=lambda n: self.ttls.get(n, self.ttls["default"])):
+            if self._classes[name].search(normalized):
+                return name
+        return "default"
+
+    def ttl_for(self, query: str) -> int:
+        return self.ttls.get(self.query_class(query), self.ttls["default"])
+
+    def _remember(self, query_hash: str, results: list, fresh_until: float, usable_until: float):
+        self._entries[query_hash] = (results, fresh_until, usable_until)
+        self._entries.move_to_end(query_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, query_hash: str):
+        """(találatok, 'fresh'|'stale') vagy None. Üres lista = negatív cache találat."""
+        now = time.time()
+        entry = self._entries.get(query_hash)
+        if entry is not None:
+            results, fresh_until, usable_until = entry
+            if now < usable_until:
+                self._entries.move_to_end(query_hash)
+                if not results:
+                    self.stats["negative_hit"] += 1
+                    return results, FRESH
+                if now < fresh_until:
+                    self.stats["memory_hit"] += 1
+                    return results, FRESH
+                self.stats["stale_hit"] += 1
+                return results, STALE
+            del self._entries[query_hash]
+
+        try:
+            row = await asyncio.to_thread(self.db.get_cached_search_entry, query_hash)
+        except Exception as e:
+            log.error(f"Search cache olvasási hiba: {e}")
+            row = None
+        if row and row[1] is not None and row[1] > -self.stale_seconds:
+            results = json.loads(row[0])
+            fresh_until = now + row[1]
+            self._remember(query_hash, results, fresh_until, fresh_until + self.stale_seconds)
+            if row[1] > 0:
+                self.stats["db_hit"] += 1
+                return results, FRESH
+            self.stats["stale_hit"] += 1
+            return results, STALE
+
+        self.stats["miss"] += 1
+        return None
+
+    async def put(self, query_hash: str, raw_query: str, results: list, ttl_seconds: int = None):
+        """ttl_seconds: felülírja az osztály szerinti TTL-t (pl. hiányos, csak snippetes találatnál)."""
+        now = time.time()
+        if not results:
+            # Negatív cache: csak memóriában, hogy egy átmeneti hiba ne ragadjon be a DB-be
+            self._remember(query_hash, [], now + self.negative_ttl, now + self.negative_ttl)
+            return
+        ttl = self.ttl_for(raw_query) if ttl_seconds is None else min(ttl_seconds, self.ttl_for(raw_query))
+        self._remember(query_hash, results, now + ttl, now + ttl + self.stale_seconds)
+        try:
+            await write_queue.write(
+                "save_search_to_cache", query_hash, raw_query, json.dumps(results), ttl_seconds=ttl
+            )
+        except Exception as e:
+            log.error(f"Search cache írási hiba: {e}")
+
+    def revalidate(self, query_hash: str, refresh_fn):
+        """Háttérfrissítés egy lejárt bejegyzéshez; kulcsonként egyszerre csak egy fut."""
+        if query_hash in self._refreshing:
+            return
+        self._refreshing.add(query_hash)
+
+        async def run():
+            try:
+                await refresh_fn()
+            except Exception as e:
+                log.error(f"Háttérfrissítési hiba: {e}")
+            finally:
+                self._refreshing.discard(query_hash)
+
+        self.tasks.spawn(run())
+
+    async def compaction_loop(self):
+        """Periodikus takarítás: a türelmi időn (stale_seconds) túl lejárt sorok törlése."""
+        while True:
+            try:
+                purged = await write_queue.write("purge_expired_search_cache", self.stale_seconds)
+                self.stats["purged"] += purged or 0
+                if purged:
+                    log.info(f"Search cache takarítás: {purged} lejárt sor törölve.")
+            except Exception as e:
+                log.error(f"Search cache takarítási hiba: {e}")
+            await asyncio.sleep(self.compaction_interval)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "memory_entries": len(self._entries), "refreshing": len(self._refreshing)}
+
+search_cache = SearchCache()
@@ -0,0 +1,186 @@
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from core.logger import get_logger
+
+log = get_logger("router")
+
+def normalize_query(text: str) -> str:
+    """Kisbetű, ékezetek és írásjelek nélkül, összevont szóközökkel (cache kulcs)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+class HeuristicRouter:
+    """1. szint: szabály/kulcsszó alapú osztályozó a router.system_prompt kritériumaiból.
+
+    Csak akkor dönt, ha az egyik oldal egyértelmű (van találata, a másiknak nincs);
+    egyébként None-t ad, és a döntés a következő szintre kerül.
+    """
+
+    # KERESÉS SZÜKSÉGES (YES) - tisztségviselők, helyek, időérzékeny és tényadatok.
+    # Csak adatra utaló szavak: a puszta idő- és árszavak (ma, most, jelenleg, ára...) a
+    # csevegésben is gyakoriak ("Mit csinálsz most?"), azokról a cache / LLM szint dönt.
+    SEARCH_PATTERNS = [
+        r"\bpolgarmester", r"\belnok", r"\bceo\b", r"\bvezerigazgato", r"\bminiszter", r"\bkormanyfo",
+        r"\bnyitvatart", r"\bnyitva\b", r"\bcime\b", r"\bcimet\b", r"\balapit", r"\bhol (van|talalhato)",
+        r"\barfolyam", r"\bidojaras", r"\beredmeny", r"\bhirek?\b", r"\bmeccs", r"\btozsde",
+        r"\blakossag", r"\btorveny", r"\bjogszabaly", r"\bspecifikaci", r"\bstatisztik",
+        r"\b20(2[4-9]|3\d)\b", r"\bmennyibe kerul",
+        r"\bwho is\b", r"\bnews\b", r"\bweather\b", r"\bprice\b",
+    ]
+    # KERESÉS NEM KELL (NO) - csevegés, matek, kód, nyelvi feladat, megadott szöveg feldolgozása
+    INTERNAL_PATTERNS = [
+        r"^(szia|szervusz|hello|hallo|udv|jo (reggelt|napot|estet)|koszi|koszonom|hi|hey)\b",
+        r"\bhogy vagy\b", r"\bmit gondolsz\b", r"\bszerinted\b", r"\bki vagy\b", r"\bmi a neved\b",
+        r"\bszamold\b", r"\bszamitsd\b", r"\bszamolj\b", r"^[\d\s\+\-\*/\(\)\.,=x^]+$",
+        r"\bkod\w*\b", r"\bpython\b", r"\bjavascript\b", r"\bfuggveny", r"\bscript\b", r"\bdebug",
+        r"\bforditsd\b", r"\bforditas", r"\bvers(et|ek|eket|ike|ben)?\b", r"\bfogalmazd", r"\birj (egy|nekem)",
+        r"\bjavitsd\b", r"\bstilus", r"\bosszefoglal", r"\bformazd\b", r"\btask\b",
+        r"\btranslate\b", r"\bcode\b", r"\bpoem\b",
+    ]
+
+    def __init__(self):
+        self._search = [re.compile(p) for p in self.SEARCH_PATTERNS]
+        self._internal = [re.compile(p) for p in self.INTERNAL_PATTERNS]
+
+    def classify(self, normalized: str):
+        """True (keresés), False (belső) vagy None (nem biztos)."""
+        search_hits = sum(1 for p in self._search if p.search(normalized))
+        internal_hits = sum(1 for p in self._internal if p.search(normalized))
+        if search_hits and not internal_hits:
+            return True
+        if internal_hits and not search_hits:
+            return False
+        return None
+
+class DecisionCache:
+    """2. szint: LRU + TTL cache a korábbi döntésekre, normalizált kérdés kulccsal.
+
+    Opcionálisan embedding-hasonlóság alapján is talál (közel azonos kérdések).
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, similarity=0.92):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # kulcs -> (döntés, lejárat, vektor)
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        decision, expires, _ = entry
+        if expires < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return decision
+
+    def get_similar(self, vector):
+        """A legközelebbi még érvényes döntés, ha a koszinusz hasonlóság eléri a küszöböt."""
+        now = time.time()
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        best, best_score = None, self.similarity
+        for decision, expires, vec in self._entries.values():
+            if vec is None or expires < now or vec.shape != q.shape:
+                continue
+            score = float(vec @ q)
+            if score >= best_score:
+                best, best_score = decision, score
+        return best
+
+    def put(self, key: str, decision: bool, vector=None):
+        vec = None
+        if vector is not None:
+            vec = np.asarray(vector, dtype=np.float32)
+            vec = vec / (np.linalg.norm(vec) or 1.0)
+        self._entries[key] = (decision, time.time() + self.ttl, vec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+class SearchRouter:
+    """Többszintű keresési döntés: heurisztika -> cache (pontos / hasonló) -> LLM."""
+
+    def __init__(self, router_cfg: dict, embed_fn=None):
+        cache_cfg = router_cfg.get("cache", {})
+        self.heuristics_enabled = router_cfg.get("heuristics", True)
+        self.heuristic = HeuristicRouter()
+        self.cache = DecisionCache(
+            max_size=cache_cfg.get("max_size", 1024),
+            ttl=cache_cfg.get("ttl_seconds", 3600),
+            similarity=cache_cfg.get("similarity", 0.92),
+        )
+        # Embedding-hasonlóság csak akkor, ha be van kapcsolva és van embedding függvény
+        self.embed_fn = embed_fn if cache_cfg.get("semantic", False) else None
+        self.stats = {"heuristic": 0, "cache_hit": 0, "semantic_hit": 0, "cache_miss": 0, "llm": 0, "llm_failed": 0}
+
+    def peek(self, user_message: str):
+        """Csak az olcsó, szinkron szintek (heurisztika + pontos cache). None = nem biztos."""
+        key = normalize_query(user_message)
+
+        if self.heuristics_enabled:
+            decision = self.heuristic.classify(key)
+            if decision is not None:
+                self.stats["heuristic"] += 1
+                log.info(f"Router (heurisztika): {'SEARCH' if decision else 'INTERNAL'}")
+                return decision
+
+        decision = self.cache.get(key)
+        if decision is not None:
+            self.stats["cache_hit"] += 1
+            log.info(f"Router (cache): {'SEARCH' if decision else 'INTERNAL'}")
+        return decision
+
+    async def decide(self, user_message: str, llm_fn, skip_peek: bool = False) -> bool:
+        if not skip_peek:
+            decision = self.peek(user_message)
+            if decision is not None:
+                return decision
+        return await self._decide_slow(user_message, llm_fn)
+
+    async def _decide_slow(self, user_message: str, llm_fn) -> bool:
+        """Drága szintek: embedding-hasonlóság, végül az LLM."""
+        key = normalize_query(user_message)
+        vector = None
+        if self.embed_fn:
+            try:
+                vector = await self.embed_fn(user_message)
+            except Exception as e:
+                log.warning(f"Router embedding hiba: {e}")
+            if vector:
+                decision = self.cache.get_similar(vector)
+                if decision is not None:
+                    self.stats["semantic_hit"] += 1
+                    self.cache.put(key, decision, vector)
+                    log.info(f"Router (hasonló kérdés): {'SEARCH' if decision else 'INTERNAL'}")
+                    return decision
+
+        self.stats["cache_miss"] += 1
+        self.stats["llm"] += 1
+        decision = await llm_fn(user_message)
+        if decision is None:
+            # Nincs érvényes döntés (Ollama hiba, határidő, preemptálás): nem cache-eljük,
+            # különben egy átmeneti hiba egy óráig INTERNAL-ra kényszerítené a hasonló kérdéseket
+            self.stats["llm_failed"] += 1
+            log.warning("Router: nincs érvényes LLM döntés, alapértelmezett: INTERNAL (nem cache-elve)")
+            return False
+        self.cache.put(key, decision, vector)
+        return decision
+
+    def get_stats(self) -> dict:
+        total = sum(v for k, v in self.stats.items() if k not in ("cache_miss", "llm_failed"))
+        cache_lookups = self.stats["cache_hit"] + self.stats["semantic_hit"] + self.stats["cache_miss"]
+        return {
+            **self.stats,
+            "total": total,
+            "llm_rate": round(self.stats["llm"] / total, 3) if total else 0.0,
+            "cache_hit_rate": round((self.stats["cache_hit"] + self.stats["semantic_hit"]) / cache_lookups, 3)
+                              if cache_lookups else 0.0,
+            "cache_size": len(self.cache._entries),
+        }
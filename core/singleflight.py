@@ -0,0 +1,64 @@
+import asyncio
+from core.logger import get_logger
+
+log = get_logger("singleflight")
+
+class SingleFlight:
+    """Azonos, egyszerre futó kérések összevonása: kulcsonként egy munka fut, a többi
+    hívó ugyanarra az eredményre vár.
+
+    A munka külön taskban fut, így ha az egyik hívót lemondják, a többiek eredménye ettől
+    még elkészül. Ha viszont az utolsó várakozó is lemondta (pl. a router INTERNAL-t
+    döntött a spekulatív keresésre), a munkát is leállítjuk, nem fut feleslegesen végig.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self._waiters = {}
+        self.stats = {"calls": 0, "shared": 0, "cancelled": 0}
+
+    async def do(self, key, fn):
+        """fn() eredménye; ha ugyanezzel a kulccsal már fut egy hívás, annak eredménye."""
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.stats["shared"] += 1
+            log.debug(f"[{self.name}] Összevont kérés: {key}")
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._inflight.get(key) is task and self._waiters[key] == 1 and not task.done():
+                # Az utolsó várakozó is elment: a közös munkát is leállítjuk, és azonnal
+                # kivesszük, hogy egy közben érkező új hívó ne a leálló taskra csatlakozzon
+                task.cancel()
+                del self._inflight[key]
+                del self._waiters[key]
+                self.stats["cancelled"] += 1
+                log.debug(f"[{self.name}] Lemondva (nincs több várakozó): {key}")
+            raise
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        # Ha már senki sem várt rá, a kivételt itt "olvassuk ki" (ne legyen figyelmeztetés)
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "inflight": len(self._inflight)}
+
+search_flight = SingleFlight("search")
+llm_flight = SingleFlight("llm")
+page_flight = SingleFlight("page")
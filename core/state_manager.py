@@ -41,8 +41,25 @@ class StateManager:
         """Az írnoknak küldendő utólagos elemző prompt (angol logika)."""
         return self.get_template("scribe_logic_en")
 
-    def assemble_kope_system_prompt(self, model_name="lelek-core-v1", cleaned_context=""):
-        """A nagy 12B modell (Kópé) tehermentesített promptja a JSON személyiséggel."""
+    # Állandó kimeneti szabályok: a stabil prefix része, hogy az Ollama prompt-cache újrahasznosíthassa
+    OUTPUT_FORMAT_RULES = (
+        "### OUTPUT FORMAT RULES:\n"
+        "1. Respond in HUNGARIAN.\n"
+        "2. Add a <notepad> section in ENGLISH at the end for reflections.\n"
+        "3. IF a task is needed: Add a <task> block. NEVER use the word 'Description'. "
+        "SUMMARIZE the actual task. Format: <task>Task summary | Priority(1-5) | YYYY-MM-DD HH:MM</task>"
+    )
+
+    def get_stable_prefix(self, model_name="lelek-core-v1"):
+        """A prompt bájtra stabil eleje: személyiség + szabályok + kimeneti formátum.
+
+        Modellenként cache-eljük (a /system/reload üríti), így minden hívásnál
+        pontosan ugyanaz a szöveg, és az Ollama KV-cache-e újrahasznosítja.
+        """
+        cache_key = f"__prefix__:{model_name}"
+        if cache_key in self.cached_prompts:
+            return self.cached_prompts[cache_key]
+
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         persona_path = os.path.join(base_path, "prompts", "personas.json")
         
@@ -62,25 +79,40 @@ class StateManager:
             identity = ("VISELKEDÉS: Te vagy Kópé, a magyar népmesék ravasz, szarkasztikus alakja. "
                        "Stílusod ízes, népi, pimasz. Ha a gép elromlik, te akkor is betyár maradsz!")
 
+        prefix = f"{identity}\n\n{self.OUTPUT_FORMAT_RULES}\n"
+        self.cached_prompts[cache_key] = prefix
+        return prefix
+
+    def assemble_volatile_block(self, cleaned_context="", extras=""):
+        """A prompt hívásonként változó része: idő (percre kerekítve), karma, kontextus, jegyzetek."""
         # 2. DINAMIKUS META ADATOK (Idő + Karma)
         now = datetime.now()
         napok = ["hétfő", "kedd", "szerda", "csütörtök", "péntek", "szombat", "vasárnap"]
         
         meta = f"\n--- RENDSZER INFÓ ---\n"
-        meta += f"- Idő: {now.strftime('%Y-%m-%d')} {napok[now.weekday()]}, {now.strftime('%H:%M:%S')}\n"
+        meta += f"- Idő: {now.strftime('%Y-%m-%d')} {napok[now.weekday()]}, {now.strftime('%H:%M')}\n"
         
         if self.config.get("context_injection", {}).get("show_karma"):
             karma_score = self.config.get('karma', {}).get('current_score', 100)
             meta += f"- Rendszer Karma: {karma_score}/100\n"
         meta += "--- VÉGE ---\n"
         
-        # 3. ÖSSZEÁLLÍTÁS
-        prompt = (
-            f"{identity}\n\n"
-            f"### KONTEXTUS (Tények a világból):\n{cleaned_context if cleaned_context else 'Nincs külső adat.'}\n\n"
-            f"{meta}"
+        block = (
+            f"{meta}\n"
+            f"### KONTEXTUS (Tények a világból):\n{cleaned_context if cleaned_context else 'Nincs külső adat.'}\n"
         )
-        return prompt
+        if extras:
+            block += f"\n{extras}\n"
+        return block
+
+    def assemble_kope_system_prompt(self, model_name="lelek-core-v1", cleaned_context="", extras=""):
+        """A nagy 12B modell (Kópé) tehermentesített promptja a JSON személyiséggel.
+
+        Sorrend: stabil prefix (személyiség, szabályok, formátum), utána a változó
+        rész (idő percre kerekítve, karma, kontextus, jegyzetek/memóriák).
+        """
+        # 3. ÖSSZEÁLLÍTÁS
+        return self.get_stable_prefix(model_name) + self.assemble_volatile_block(cleaned_context, extras)
 
     def get_temperature(self):
         """Visszahozva a régi logikát a konfigurációból."""
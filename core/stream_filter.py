@@ -0,0 +1,87 @@
+class InternalBlockFilter:
+    """Inkrementális szűrő a streamelt válaszhoz.
+
+    Ugyanazt csinálja, mint a process_message regexe (<notepad>/<task>/<logic>
+    blokkok kivágása + strip), csak darabonként: a blokkokat és a félig
+    beérkezett nyitó tageket visszatartja, amíg el nem dől, mi lesz belőlük.
+    """
+
+    TAGS = ("notepad", "task", "logic")
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = None      # Az éppen elnyelt blokk tag-neve
+        self._pending_ws = ""    # Visszatartott záró whitespace (a végső strip miatt)
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        """Új token(ek) befogadása. Visszaadja a már biztonságosan kiküldhető szöveget."""
+        self._buffer += chunk
+        out = []
+
+        while self._buffer:
+            if self._inside:
+                closing = f"</{self._inside}>"
+                idx = self._buffer.lower().find(closing)
+                if idx == -1:
+                    # A blokk tartalma eldobható, csak egy esetleges félkész záró tag marad
+                    self._buffer = self._buffer[-(len(closing) - 1):]
+                    break
+                self._buffer = self._buffer[idx + len(closing):]
+                self._inside = None
+                continue
+
+            lt = self._buffer.find("<")
+            if lt == -1:
+                out.append(self._buffer)
+                self._buffer = ""
+                break
+
+            out.append(self._buffer[:lt])
+            rest = self._buffer[lt:]
+            lowered = rest.lower()
+
+            matched, partial = None, False
+            for tag in self.TAGS:
+                opener = f"<{tag}>"
+                if lowered.startswith(opener):
+                    matched = tag
+                    break
+                if opener.startswith(lowered):
+                    partial = True
+
+            if matched:
+                self._inside = matched
+                self._buffer = rest[len(matched) + 2:]
+            elif partial:
+                # Még nem tudjuk eldönteni (pl. "<note"), várunk a következő tokenre
+                self._buffer = rest
+                break
+            else:
+                out.append("<")
+                self._buffer = rest[1:]
+
+        return self._emit("".join(out))
+
+    def flush(self) -> str:
+        """Generálás vége: a maradék (nem tag) puffer kiürítése."""
+        tail = "" if self._inside else self._buffer
+        self._buffer = ""
+        self._inside = None
+        text = self._emit(tail)
+        self._pending_ws = ""
+        return text
+
+    def _emit(self, text: str) -> str:
+        if not text:
+            return ""
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+
+        text = self._pending_ws + text
+        stripped = text.rstrip()
+        self._pending_ws = text[len(stripped):]
+        return stripped
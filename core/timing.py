@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+from core.logger import get_logger
+
+log = get_logger("startup")
+
+class StartupTimer:
+    """Indulási fázisok (importok, inicializálás, warm-up) időmérése és riportja."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    def report(self, title: str = "Indulási idők"):
+        lines = [f"--- {title} (össz: {time.perf_counter() - self.started:.2f}s) ---"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<32} {seconds * 1000:8.1f} ms")
+        log.info("\n".join(lines))
+        return self.phases
+
+startup_timer = StartupTimer()
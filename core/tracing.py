@@ -0,0 +1,158 @@
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from core.logger import get_logger, trace_id_var
+
+log = get_logger("tracing")
+
+# Másodperc alapú bucketek a lépésekhez, token bucketek az Ollama számlálókhoz
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_trace_spans = contextvars.ContextVar("trace_spans", default=None)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Histogram:
+    """Prometheus histogram (kumulatív bucketek + _sum + _count) címkénként."""
+
+    def __init__(self, name: str, help_text: str, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series = {}  # címke-értékek -> [bucket számlálók, összeg, darab]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for key, (counts, total, count) in items:
+                base = [f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, key)]
+                for bound, c in zip(self.buckets, counts):
+                    labels = ",".join(base + [f'le="{bound:g}"'])
+                    lines.append(f"{self.name}_bucket{{{labels}}} {c}")
+                labels = ",".join(base + ['le="+Inf"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {count}")
+                suffix = "{" + ",".join(base) + "}" if base else ""
+                lines.append(f"{self.name}_sum{suffix} {total:.6f}")
+                lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+class MetricsRegistry:
+    """A /metrics végpont forrása (Prometheus text exposition formátum)."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def histogram(self, name: str, help_text: str, buckets=SECONDS_BUCKETS, label_names=()):
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help_text, buckets, label_names)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class Tracer:
+    """Kérésenkénti trace (beszélgetés-kör) és lépésenkénti span-ek.
+
+    A trace azonosító contextvarban él, így a child taskok és az asyncio.to_thread
+    hívások is öröklik, és minden log sorban megjelenik. A span-ek időtartama és
+    az Ollama token/idő statisztikái histogramokba kerülnek.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.span_seconds = registry.histogram(
+            "soulcore_span_duration_seconds", "Pipeline lépések időtartama.", SECONDS_BUCKETS, ("span",)
+        )
+        self.llm_tokens = registry.histogram(
+            "soulcore_llm_tokens", "Ollama token számok (prompt_eval / eval) hívásonként.",
+            TOKEN_BUCKETS, ("span", "model", "kind")
+        )
+        self.llm_seconds = registry.histogram(
+            "soulcore_llm_duration_seconds", "Ollama belső időmérései (load / prompt_eval / eval / total).",
+            SECONDS_BUCKETS, ("span", "model", "phase")
+        )
+
+    @staticmethod
+    def current_trace_id() -> str:
+        return trace_id_var.get()
+
+    @contextmanager
+    def trace(self, conv_id: str):
+        """Egy beszélgetés-kör trace-e; kilépéskor összegző log sor a lépésidőkkel."""
+        trace_id = f"{conv_id[:24]}:{uuid.uuid4().hex[:8]}"
+        id_token = trace_id_var.set(trace_id)
+        spans_token = _trace_spans.set([])
+        t0 = time.perf_counter()
+        try:
+            yield trace_id
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.span_seconds.observe(elapsed, span="request")
+            spans = _trace_spans.get() or []
+            summary = " | ".join(f"{s['name']}={s['seconds']:.3f}s" for s in spans)
+            log.info(f"Trace kész ({elapsed:.2f}s): {summary or '-'}")
+            self._reset(_trace_spans, spans_token)
+            self._reset(trace_id_var, id_token)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        record = {"name": name, "seconds": 0.0, **attrs}
+        parent_token = _current_span.set(record)
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - t0
+            self.span_seconds.observe(record["seconds"], span=name)
+            spans = _trace_spans.get()
+            if spans is not None:
+                spans.append(record)
+            log.debug(f"Span: {name} {record['seconds'] * 1000:.1f} ms {attrs or ''}")
+            self._reset(_current_span, parent_token)
+
+    def record_llm(self, model: str, data: dict):
+        """Az Ollama válasz statisztikái az aktuális span címkéjével (nanoszekundum -> mp)."""
+        record = _current_span.get()
+        span = record["name"] if record else "llm"
+        for kind, key in (("prompt", "prompt_eval_count"), ("completion", "eval_count")):
+            if key in data:
+                self.llm_tokens.observe(data[key], span=span, model=model, kind=kind)
+        for phase in ("load", "prompt_eval", "eval", "total"):
+            key = f"{phase}_duration"
+            if key in data:
+                self.llm_seconds.observe(data[key] / 1e9, span=span, model=model, phase=phase)
+        if record is not None:
+            record.update({k: data[k] for k in ("prompt_eval_count", "eval_count") if k in data})
+
+    @staticmethod
+    def _reset(var, token):
+        # Async generátorban a kilépés más kontextusban is történhet (pl. megszakított stream)
+        try:
+            var.reset(token)
+        except ValueError:
+            pass
+
+metrics = MetricsRegistry()
+tracer = Tracer(metrics)
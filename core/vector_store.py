@@ -0,0 +1,313 @@
+import os
+import json
+import asyncio
+import threading
+import numpy as np
+from core.logger import get_logger
+from core.background import BackgroundTasks
+
+log = get_logger("vector_store")
+
+class IVFIndex:
+    """Egyszerű IVF (inverted file) közelítő index nagy korpuszokhoz.
+
+    K-means centroidokra osztja a vektorokat, keresésnél csak a kérdéshez
+    legközelebbi 'nprobe' lista elemeit pontozza. Kis korpusznál felesleges.
+    """
+
+    def __init__(self, nlist=64, nprobe=8, iterations=10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids = None
+        self.lists = []
+        self.size = 0
+
+    def build(self, matrix: np.ndarray):
+        n = matrix.shape[0]
+        k = max(1, min(self.nlist, n // 39 or 1))  # ~39 pont / centroid alatt nincs értelme
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(n, k, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assign = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(k):
+                members = matrix[assign == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.nonzero(assign == c)[0] for c in range(k)]
+        self.size = n
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        return np.concatenate([self.lists[c] for c in probes])
+
+class VectorStore:
+    """Lokális vektor index a memóriához, perzisztált embeddingekkel.
+
+    A vektorok normalizált float32 sorokként, egyetlen folytonos fájlba kerülnek
+    (vectors.f32), amit np.memmap-pel olvasunk; a metaadatok soronként a
+    meta.jsonl-ben. A keresés egyetlen mátrixszorzás (koszinusz hasonlóság).
+    """
+
+    def __init__(self, path="vector_store", ann=None, ivf_min_vectors=20000, nlist=64, nprobe=8):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "meta.jsonl")
+        self.header_path = os.path.join(path, "index.json")
+        self.ann = ann
+        self.ivf_min_vectors = ivf_min_vectors
+        self.ivf = IVFIndex(nlist=nlist, nprobe=nprobe) if ann == "ivf" else None
+
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._kinds = None
+        self.dim = None
+        self.model = None
+        self.meta = []
+        self.refs = set()
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.header_path):
+            with open(self.header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim, self.model = header.get("dim"), header.get("model")
+
+        meta_lines = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    meta_lines += 1
+                    if meta_lines == len(self.meta) + 1:
+                        try:
+                            self.meta.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            # Félbeszakadt sor: ami utána jön, az sem tartozhat a vektorokhoz
+                            pass
+
+        # Félbemaradt írás után a rövidebbikhez igazodunk, a lemezen is: különben a következő
+        # hozzáfűzés más sorra kerülne a vektorfájlban, mint a metája
+        rows = self._rows_on_disk()
+        n = min(rows, len(self.meta))
+        if rows * 4 * (self.dim or 0) != self._vector_bytes() or n != rows or n != meta_lines:
+            log.warning(f"Vektor/meta eltérés ({rows} vs {meta_lines}), mindkét fájl csonkolva {n} elemre.")
+            self._truncate(n)
+        self.refs = {(m["kind"], m["ref"]) for m in self.meta}
+        log.info(f"Vektor index betöltve: {len(self.meta)} elem ({self.path}).")
+
+    def _rows_on_disk(self):
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _vector_bytes(self):
+        return os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+
+    def _truncate(self, n: int):
+        """A vektorfájl n sorra, a meta.jsonl n bejegyzésre vágása."""
+        if os.path.exists(self.vectors_path):
+            os.truncate(self.vectors_path, n * 4 * (self.dim or 0))
+        self.meta = self.meta[:n]
+        # Atomikus csere: összeomláskor a régi vagy az új fájl marad, félkész nem
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for m in self.meta:
+                f.write(json.dumps(m, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.meta_path)
+
+    def _get_matrix(self):
+        """A vektorfájl memmap nézete (újratérképezve, ha azóta bővült)."""
+        n = len(self.meta)
+        if n == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    def _kinds_array(self):
+        if self._kinds is None or len(self._kinds) != len(self.meta):
+            self._kinds = np.array([m["kind"] for m in self.meta])
+        return self._kinds
+
+    def __len__(self):
+        return len(self.meta)
+
+    def contains(self, kind: str, ref) -> bool:
+        return (kind, str(ref)) in self.refs
+
+    def add(self, kind: str, ref, text: str, vector, model: str = None) -> bool:
+        """Egy elem hozzáfűzése (append-only). A már indexelt (kind, ref) párokat kihagyja."""
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return False
+        vec = vec / norm
+
+        with self._lock:
+            ref = str(ref)
+            if (kind, ref) in self.refs:
+                return False
+            if self.dim is None:
+                self.dim, self.model = int(vec.shape[0]), model
+                with open(self.header_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "model": self.model}, f)
+            elif vec.shape[0] != self.dim:
+                log.error(f"Dimenzió eltérés: {vec.shape[0]} != {self.dim} ({kind}:{ref})")
+                return False
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vec.tobytes())
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"kind": kind, "ref": ref, "text": text[:500]}, ensure_ascii=False) + "\n")
+            self.meta.append({"kind": kind, "ref": ref, "text": text[:500]})
+            self.refs.add((kind, ref))
+            return True
+
+    def search(self, query_vector, k: int = 5, kind: str = None):
+        """Top-k legközelebbi elem: [(score, meta), ...] csökkenő sorrendben."""
+        with self._lock:
+            matrix = self._get_matrix()
+            if matrix is None:
+                return []
+            q = np.asarray(query_vector, dtype=np.float32)
+            if q.shape[0] != self.dim:
+                return []
+            q = q / (np.linalg.norm(q) or 1.0)
+
+            candidates = None
+            if self.ivf is not None and len(self.meta) >= self.ivf_min_vectors:
+                # Az IVF-et akkor építjük újra, ha a korpusz azóta érdemben (25%) nőtt
+                if self.ivf.centroids is None or len(self.meta) > self.ivf.size * 1.25:
+                    self.ivf.build(np.asarray(matrix))
+                candidates = self.ivf.candidates(q)
+                # Az utolsó build óta hozzáfűzött elemeket mindig pontozzuk
+                candidates = np.concatenate([candidates, np.arange(self.ivf.size, len(self.meta))])
+
+            if kind is not None:
+                pool = candidates if candidates is not None else np.arange(len(self.meta))
+                candidates = pool[self._kinds_array()[pool] == kind]
+
+            if candidates is None:
+                scores = matrix @ q
+                idx = np.arange(len(scores))
+            else:
+                if len(candidates) == 0:
+                    return []
+                scores = matrix[candidates] @ q
+                idx = candidates
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self.meta[int(idx[i])]) for i in top]
+
+class MemoryIndexer:
+    """Az írások mellé futó inkrementális embeddelés (jegyzetek, tények, cache-elt oldalak).
+
+    Folyamatszintű példány (memory_indexer), a Kernel konfigurálja induláskor.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.provider = None
+        self.model = "embeddinggemma:latest"
+        self.batch_size = 32
+        self.concurrency = 4
+        self.loop = None
+        self.tasks = BackgroundTasks("memory_indexer")
+
+    def configure(self, config: dict):
+        from core.provider import LLMProvider
+        mem_cfg = config.get("memory", {})
+        self.model = mem_cfg.get("embedding_model", self.model)
+        self.batch_size = mem_cfg.get("embed_batch_size", 32)
+        self.concurrency = mem_cfg.get("embed_concurrency", 4)
+        self.provider = LLMProvider(config["provider"]["base_url"], self.model)
+        self.store = VectorStore(
+            path=mem_cfg.get("vector_path", "vector_store"),
+            ann=mem_cfg.get("ann"),
+            ivf_min_vectors=mem_cfg.get("ivf_min_vectors", 20000),
+            nlist=mem_cfg.get("ivf_nlist", 64),
+            nprobe=mem_cfg.get("ivf_nprobe", 8),
+        )
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def start(self):
+        """Az event loop megjegyzése (a lifespan hívja), hogy szinkron kódból is ütemezhessünk."""
+        self.loop = asyncio.get_running_loop()
+
+    def schedule(self, kind: str, ref, text: str):
+        """index_text ütemezése bármelyik szálból (pl. a DBManager írásai után)."""
+        if not self.enabled or self.loop is None or self.loop.is_closed():
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(lambda: self.tasks.spawn(self.index_text(kind, ref, text)))
+        except RuntimeError:
+            pass  # a loop közben leállt
+
+    async def index_text(self, kind: str, ref, text: str):
+        """Egy szöveg embeddelése és hozzáfűzése. Hibánál csak naplóz (háttérfeladat)."""
+        if not self.enabled or not text or self.store.contains(kind, ref):
+            return
+        try:
+            vector = await self.provider.generate_embedding(text, model=self.model)
+            if vector:
+                # Fájlhozzáfűzés a szálkészletben, ne az event loopon
+                await asyncio.to_thread(self.store.add, kind, ref, text, vector, self.model)
+        except Exception as e:
+            log.error(f"Indexelési hiba ({kind}:{ref}): {e}")
+
+    async def index_many(self, kind: str, items: list):
+        """items: [(ref, szöveg), ...] - batch embeddeléssel (kevés HTTP kérés, cache-elve)."""
+        if not self.enabled:
+            return
+        todo = [(ref, text) for ref, text in items if text and not self.store.contains(kind, ref)]
+        if not todo:
+            return
+        try:
+            vectors = await self.provider.generate_embeddings(
+                [text for _, text in todo], model=self.model,
+                batch_size=self.batch_size, concurrency=self.concurrency
+            )
+            added = await asyncio.to_thread(self._add_all, kind, todo, vectors)
+            log.info(f"Batch indexelés ({kind}): {added}/{len(todo)} elem.")
+        except Exception as e:
+            log.error(f"Batch indexelési hiba ({kind}): {e}")
+
+    def _add_all(self, kind: str, items: list, vectors: list) -> int:
+        return sum(1 for (ref, text), vec in zip(items, vectors)
+                   if vec and self.store.add(kind, ref, text, vec, model=self.model))
+
+    async def backfill_long_term(self, db):
+        """A még nem indexelt hosszútávú tények pótlása (pl. kívülről beírt sorok)."""
+        if not self.enabled:
+            return
+        rows = await asyncio.to_thread(db.get_long_term_facts)
+        await self.index_many("fact", [
+            (fact_id, f"{subject} {predicate or ''} {obj or ''}".strip())
+            for fact_id, subject, predicate, obj in rows
+        ])
+
+    async def search(self, text: str, k: int = 5, kind: str = None):
+        if not self.enabled or len(self.store) == 0:
+            return []
+        vector = await self.provider.generate_embedding(text, model=self.model)
+        if not vector:
+            return []
+        # A mátrixszorzás (és nagy korpusznál az IVF újraépítés) a szálkészletben fut,
+        # hogy ne állítsa meg a folyamatban lévő streameket
+        return await asyncio.to_thread(self.store.search, vector, k, kind)
+
+memory_indexer = MemoryIndexer()
@@ -0,0 +1,207 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, InvalidStateError
+from core.logger import get_logger
+from core.database import DBManager
+
+log = get_logger("write_queue")
+
+class WriteQueueClosed(RuntimeError):
+    """Írás a leállás után (a write-behind sor már le van zárva)."""
+
+_FLUSH = object()
+_STOP = object()
+
+class WriteQueue:
+    """Write-behind sor a ritkán olvasott, gyakori írásokhoz (jegyzetek, naplók, feladatok,
+    modell-upsertek).
+
+    Egyetlen író szál gyűjti a műveleteket, és méret (max_batch) vagy idő (flush_interval_ms)
+    szerint egy tranzakcióban véglegesíti őket. A műveletek DBManager metódusnevek
+    paraméterekkel; mindegyik egy Future-t ad, amelyen az eredmény (pl. új task id) érkezik.
+    Ha a sor megtelt (max_pending), a hívó vár (backpressure); amíg az író szál el sem
+    indult, a műveletek szinkron, közvetlenül hajtódnak végre. A close() után minden írás
+    WriteQueueClosed hibát ad: leálláskor a kapcsolatok már le vannak zárva.
+    """
+
+    def __init__(self):
+        self.max_batch = 64
+        self.flush_interval = 0.2
+        self.max_pending = 1000
+        self.db = None
+        self._queue = None
+        self._thread = None
+        self._closed = False
+        self.stats = {"writes": 0, "batches": 0, "failed": 0, "max_batch_seen": 0, "backpressure": 0}
+        self._last_full_warning = 0.0
+
+    def configure(self, wq_cfg: dict):
+        self.max_batch = wq_cfg.get("max_batch", self.max_batch)
+        self.flush_interval = wq_cfg.get("flush_interval_ms", self.flush_interval * 1000) / 1000
+        self.max_pending = wq_cfg.get("max_pending", self.max_pending)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, db):
+        if self.running:
+            return
+        self.db = db
+        self._closed = False
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._writer, name="db-writer", daemon=True)
+        self._thread.start()
+        log.info(f"Write-behind sor elindítva (batch: {self.max_batch}, {self.flush_interval * 1000:.0f} ms).")
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """Írás sorba állítása; blokkol, ha a sor tele van (szálakból vagy szinkron kódból)."""
+        future = Future()
+        self._check_open(method)
+        if not self.running:
+            self._run_inline(future, method, args, kwargs)
+            return future
+        self._queue.put((method, args, kwargs, future))
+        return future
+
+    async def write(self, method: str, *args, **kwargs):
+        """Async belépési pont: tele sornál az event loop nem blokkol, csak ez a hívó vár."""
+        self._check_open(method)
+        if not self.running:
+            return await asyncio.to_thread(self._run_sync, method, args, kwargs)
+        future = Future()
+        item = (method, args, kwargs, future)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["backpressure"] += 1
+            if time.monotonic() - self._last_full_warning > 5:
+                self._last_full_warning = time.monotonic()
+                log.warning("Write-behind sor megtelt, a hívók várnak (backpressure).")
+            await asyncio.to_thread(self._queue.put, item)
+        return await asyncio.wrap_future(future)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Megvárja, amíg minden addig beküldött írás véglegesül."""
+        if not self.running:
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Leálláskor: a függő írások véglegesítése, majd az író szál leállítása."""
+        if not self.running:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.error("Az író szál nem állt le időben, függő írások maradhattak.")
+        else:
+            log.info(f"Write-behind sor lezárva ({self.stats['writes']} írás, {self.stats['batches']} batch).")
+        self._thread = None
+
+    def _check_open(self, method):
+        if self._closed:
+            log.error(f"Írás a lezárt sorba, eldobva: {method}")
+            raise WriteQueueClosed(method)
+
+    def _run_sync(self, method, args, kwargs):
+        db = self.db or DBManager()
+        return getattr(db, method)(*args, **kwargs)
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        # A hívó közben (akár az ellenőrzés és a beállítás között is) lemondhatta a várakozást,
+        # pl. leálláskor; az írás ettől még megtörtént, az eredményt egyszerűen eldobjuk
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _run_inline(self, future, method, args, kwargs):
+        try:
+            self._resolve(future, self._run_sync(method, args, kwargs))
+        except Exception as e:
+            self._resolve(future, error=e)
+
+    def _writer(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            try:
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item[0] is _STOP:
+                        stopping = True
+                    elif item[0] is _FLUSH:
+                        waiters.append(item[1])
+                    else:
+                        batch.append(item)
+                    if stopping or waiters or len(batch) >= self.max_batch:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if stopping:
+                    # A STOP előtt beküldött, még sorban lévő írások is bekerülnek
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item[0] is _FLUSH:
+                            waiters.append(item[1])
+                        elif item[0] is not _STOP:
+                            batch.append(item)
+
+                if batch:
+                    self._commit(batch)
+            except Exception as e:
+                # Az író szál nem halhat meg: a sorban várók különben örökre lógnának
+                log.error(f"Író szál hiba ({len(batch)} művelet): {e}")
+                for _, _, _, future in batch:
+                    self._resolve(future, error=e)
+            finally:
+                for done in waiters:
+                    done.set()
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.db.transaction():
+                for method, args, kwargs, _ in batch:
+                    results.append(getattr(self.db, method)(*args, **kwargs))
+        except Exception as e:
+            # Egy hibás írás ne vigye el a többit: egyenként újrapróbáljuk
+            log.error(f"Batch írási hiba ({len(batch)} művelet), egyenkénti újrapróba: {e}")
+            for method, args, kwargs, future in batch:
+                try:
+                    # Saját tranzakcióban: így az SQL hiba kivételként jön ki, nem None eredményként
+                    with self.db.transaction():
+                        value = getattr(self.db, method)(*args, **kwargs)
+                except Exception as item_error:
+                    self.stats["failed"] += 1
+                    self._resolve(future, error=item_error)
+                else:
+                    self._resolve(future, value)
+        else:
+            for (_, _, _, future), result in zip(batch, results):
+                self._resolve(future, result)
+        self.stats["writes"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+
+write_queue = WriteQueue()
@@ -1,12 +1,28 @@
-import uvicorn
 import os, sys, signal, time, traceback, json, asyncio, hashlib
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, StreamingResponse
-from fastapi.middleware.cors import CORSMiddleware
-from core.kernel import Kernel
-from core.logger import get_logger
-from core.heartbeat import Heartbeat
-from core.ollama_core import discover_models_loop 
+from core.timing import startup_timer
+
+# Az importok idejét is mérjük (a /system/restart minden alkalommal újrafuttatja őket)
+with startup_timer.phase("import: uvicorn + fastapi"):
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+    from fastapi.middleware.cors import CORSMiddleware
+with startup_timer.phase("import: core.kernel"):
+    from core.kernel import Kernel
+with startup_timer.phase("import: core egyéb"):
+    from core.logger import get_logger
+    from core.heartbeat import Heartbeat
+    from core.ollama_core import discover_models_loop 
+    from core.http_client import http_clients
+    from core.database import DBManager
+    from core.vector_store import memory_indexer
+    from core.tracing import metrics
+    from core.llm_scheduler import llm_scheduler
+    from core.write_queue import write_queue
+    from core.search_cache import search_cache
+    from core.page_store import page_store
+    from core.scrape_scheduler import scrape_scheduler
+    from core.singleflight import search_flight, llm_flight, page_flight
 from contextlib import asynccontextmanager
 
 log = get_logger("api")
@@ -17,33 +33,62 @@ async def lifespan(app: FastAPI):
     # STARTUP
     log.info("SoulCore API indul... Háttérfolyamatok aktiválása.")
     
+    # Write-behind író szál (jegyzetek, naplók, feladatok, modell-upsertek)
+    write_queue.start(kernel.db)
+
     # Ollama felfedező hurok
     discovery_task = asyncio.create_task(discover_models_loop())
     
     # --- SZÍVVERÉS AKTIVÁLÁSA ---
     # Átadjuk a kernel adatbázis-kezelőjét a heartbeatnek
-    heartbeat = Heartbeat(kernel.db)
+    heartbeat = Heartbeat(kernel.db, kernel, kernel.state_manager.config.get("heartbeat", {}))
+    kernel.heartbeat = heartbeat
     heartbeat_task = asyncio.create_task(heartbeat.start())
+
+    # Lejárt keresési cache sorok periodikus takarítása
+    compaction_task = asyncio.create_task(search_cache.compaction_loop())
+    page_compaction_task = asyncio.create_task(page_store.compaction_loop())
+
+    # A kívülről bekerült hosszútávú tények pótlólagos vektorizálása; az új tények írás után indexelődnek
+    memory_indexer.start()
+    backfill_task = asyncio.create_task(memory_indexer.backfill_long_term(kernel.db))
     
     log.info("Ollama Discovery és Heartbeat folyamatok aktívak.")
+    startup_timer.report()
+
+    # Opcionális háttér warm-up: a szerver már fogad kéréseket, közben töltjük be a nehéz részeket
+    if kernel.state_manager.config.get("startup", {}).get("warmup", False):
+        kernel.background.spawn(asyncio.to_thread(kernel.warm_up))
     
     yield  # Itt fut az API
 
     # SHUTDOWN
     log.info("Leállás... Háttérfolyamatok lezárása.")
-    discovery_task.cancel()
     heartbeat.stop()
-    
-    try:
-        await asyncio.gather(discovery_task, return_exceptions=True)
-    except asyncio.CancelledError:
-        pass
+    loops = [discovery_task, backfill_task, compaction_task, page_compaction_task, heartbeat_task]
+    for task in loops:
+        task.cancel()
+    await asyncio.gather(*loops, return_exceptions=True)
+
+    # A még futó háttérmunka (utófeldolgozás, feladatok, oldaltár írások, indexelés) befejeződhet
+    # vagy megszakad, MIELŐTT az írási sor és a kapcsolatok lezárulnak; különben az írásaik elvesznek
+    for tasks in (kernel.background, heartbeat.tasks, search_cache.tasks, page_store.tasks, memory_indexer.tasks):
+        await tasks.drain(grace=5.0)
+
+    # A függő írások véglegesítése a kapcsolatok lezárása előtt
+    await asyncio.to_thread(write_queue.close)
+
+    # Megosztott HTTP poolok lezárása (keep-alive kapcsolatok elengedése)
+    await http_clients.aclose()
+    # Tartós SQLite kapcsolatok lezárása (WAL checkpoint)
+    DBManager.close_all()
 
 # A FastAPI példányosítása a Lifespan handler-rel
 app = FastAPI(title="LÉLEK CORE API", lifespan=lifespan)
 
 # A Kernelt globálisan példányosítjuk
-kernel = Kernel("config")
+with startup_timer.phase("init: Kernel összesen"):
+    kernel = Kernel("config")
 
 app.add_middleware(
     CORSMiddleware, 
@@ -55,16 +100,28 @@ app.add_middleware(
 # --- SEGÉDFÜGGVÉNYEK ---
 
 async def stream_generator(user_query: str, conv_id: str):
-    """Válaszok streamelése stabil session azonosítóval."""
-    full_response = await kernel.process_message(user_query, conv_id=conv_id)
-    chunk = {
-        "id": f"chatcmpl-{int(time.time())}",
-        "object": "chat.completion.chunk",
-        "created": int(time.time()),
-        "model": "lelek-core-v1",
-        "choices": [{"index": 0, "delta": {"content": full_response}, "finish_reason": None}]
-    }
-    yield f"data: {json.dumps(chunk)}\n\n"
+    """Válaszok valódi token-streamelése (OpenAI delta formátum) stabil session azonosítóval."""
+    created = int(time.time())
+    completion_id = f"chatcmpl-{created}"
+
+    def make_chunk(delta, finish_reason=None):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": "lelek-core-v1",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    yield make_chunk({"role": "assistant"})
+    try:
+        async for piece in kernel.process_message_stream(user_query, conv_id=conv_id):
+            yield make_chunk({"content": piece})
+    except Exception as e:
+        log.error(f"STREAM HIBA: {traceback.format_exc()}")
+        yield make_chunk({"content": f"Hiba: {e}"})
+    yield make_chunk({}, finish_reason="stop")
     yield "data: [DONE]\n\n"
 
 # --- ALAPVETŐ ÚTVONALAK ---
@@ -145,6 +202,46 @@ async def chat_completions(request: Request):
 
 # --- RENDSZER VEZÉRLÉS ---
 
+@app.get("/system/router_stats")
+async def router_stats():
+    """A keresési router szintjeinek találati arányai."""
+    return kernel.search_router.get_stats()
+
+@app.get("/system/prompt_cache_stats")
+async def prompt_cache_stats():
+    """Prompt-cache mérés összesítője (prompt_cache.measure: true mellett gyűlik)."""
+    return kernel.prompt_meter.summary()
+
+@app.get("/system/search_cache_stats")
+async def search_cache_stats():
+    """Keresési cache találati statisztika (memória / DB / lejárt / negatív)."""
+    return search_cache.get_stats()
+
+@app.get("/system/singleflight_stats")
+async def singleflight_stats():
+    """Összevont (megosztott eredményű) párhuzamos keresések és LLM hívások."""
+    return {"search": search_flight.get_stats(), "llm": llm_flight.get_stats(), "page": page_flight.get_stats()}
+
+@app.get("/system/page_store_stats")
+async def page_store_stats():
+    """Oldaltár: friss találat / 304 / tartalom-hash egyezés / új letöltés."""
+    return page_store.get_stats()
+
+@app.get("/system/scrape_stats")
+async def scrape_stats():
+    """Scrape ütemező: határidőn túli letöltések és hostonkénti késleltetés (leglassabb elöl)."""
+    return scrape_scheduler.get_stats()
+
+@app.get("/system/llm_queue")
+async def llm_queue():
+    """Az LLM scheduler sorainak mélysége és aktív slotjai modellenként."""
+    return llm_scheduler.get_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Lépésenkénti késleltetés és Ollama token/idő histogramok Prometheus formátumban."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/system/reload")
 async def reload_config():
     kernel.state_manager.load_config()
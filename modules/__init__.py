@@ -1,41 +1,82 @@
 import os
+import time
+import threading
 import importlib.util
 from core.logger import get_logger
 
 log = get_logger("modules")
 
-def load_modules():
-    modules = {}
-    modules_dir = os.path.dirname(__file__)
+def _load_module_file(module_name, file_path):
+    """Egy modulfájl végrehajtása és a belépési pont (execute vagy run) kinyerése."""
+    # Dinamikus importálás
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+
+    # Ellenőrizzük a belépési pontot (execute vagy run)
+    executor = None
+    if hasattr(mod, "execute"):
+        executor = mod.execute
+    elif hasattr(mod, "run"):
+        executor = mod.run
+
+    if executor:
+        return {
+            "execute": executor,
+            "description": getattr(mod, "description", "Nincs leírás")
+        }
+    return None
+
+class ModuleRegistry:
+    """Lusta modul-nyilvántartás: induláskor csak a fájlneveket gyűjti,
+    a modult az első get()-nél (vagy a warm_up()-nál) tölti be."""
+
+    def __init__(self, modules_dir):
+        self.modules_dir = modules_dir
+        self._paths = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+        for filename in sorted(os.listdir(modules_dir)):
+            if filename.endswith(".py") and filename != "__init__.py":
+                self._paths[filename[:-3]] = os.path.join(modules_dir, filename)
 
-    for filename in os.listdir(modules_dir):
-        if filename.endswith(".py") and filename != "__init__.py":
-            module_name = filename[:-3]
-            file_path = os.path.join(modules_dir, filename)
-            
-            try:
-                # Dinamikus importálás
-                spec = importlib.util.spec_from_file_location(module_name, file_path)
-                mod = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)
-                
-                # Ellenőrizzük a belépési pontot (execute vagy run)
-                executor = None
-                if hasattr(mod, "execute"):
-                    executor = mod.execute
-                elif hasattr(mod, "run"):
-                    executor = mod.run
-                
-                if executor:
-                    modules[module_name] = {
-                        "execute": executor,
-                        "description": getattr(mod, "description", "Nincs leírás")
-                    }
-                    log.info(f"Modul sikeresen betöltve: {module_name}")
-                else:
-                    log.warning(f"Modul kihagyva (nincs execute/run): {module_name}")
-                    
-            except Exception as e:
-                log.error(f"Hiba a(z) {module_name} modul betöltésekor: {e}")
-
-    return modules
\ No newline at end of file
+    def get(self, module_name, default=None):
+        if module_name not in self._paths:
+            return default
+        with self._lock:
+            if module_name not in self._loaded:
+                t0 = time.perf_counter()
+                try:
+                    entry = _load_module_file(module_name, self._paths[module_name])
+                    if entry:
+                        log.info(f"Modul sikeresen betöltve: {module_name} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+                    else:
+                        log.warning(f"Modul kihagyva (nincs execute/run): {module_name}")
+                except Exception as e:
+                    log.error(f"Hiba a(z) {module_name} modul betöltésekor: {e}")
+                    entry = None
+                self._loaded[module_name] = entry
+            entry = self._loaded[module_name]
+        return entry if entry is not None else default
+
+    def __contains__(self, module_name):
+        return module_name in self._paths
+
+    def keys(self):
+        return self._paths.keys()
+
+    def warm_up(self, timer=None):
+        """Minden modul előtöltése (háttérszálból hívandó)."""
+        for module_name in self._paths:
+            t0 = time.perf_counter()
+            self.get(module_name)
+            if timer:
+                timer.record(f"warm-up modul: {module_name}", time.perf_counter() - t0)
+
+def load_modules(lazy=True):
+    modules_dir = os.path.dirname(__file__)
+    registry = ModuleRegistry(modules_dir)
+    if not lazy:
+        registry.warm_up()
+    log.info(f"Modulok regisztrálva ({'lusta' if lazy else 'azonnali'} betöltés): {', '.join(registry.keys())}")
+    return registry
@@ -0,0 +1,18 @@
+from core.vector_store import memory_indexer
+
+description = "Keresés a feltöltött dokumentumokban és memóriában. Bemenet: keresési kifejezés (string)"
+
+async def run(query: str, k: int = 5):
+    # 1. Kérés vektorizálása + top-k keresés a lokális indexben (egy mátrixszorzás)
+    if not memory_indexer.enabled:
+        return "Hiba: A vektor memória nincs bekapcsolva."
+
+    hits = await memory_indexer.search(query, k=k)
+    if not hits:
+        return f"Nincs találat a(z) '{query}' kifejezésre a memóriában."
+
+    # 2. Strukturált lista a későbbi Rerankernek
+    return [
+        {"title": f"{meta['kind']}:{meta['ref']}", "content": meta["text"], "score": round(score, 4)}
+        for score, meta in hits
+    ]
@@ -1,33 +1,82 @@
-import httpx
 import urllib.parse
 import re
 import asyncio
 import hashlib
-import json  # <-- EZ KELL A JSON.DUMPS-HOZ
-from bs4 import BeautifulSoup
 from core.logger import get_logger
-from core.database import DBManager 
+from core.search_cache import search_cache
+from core.singleflight import search_flight
+from core.http_client import http_clients
+from core.vector_store import memory_indexer
+from core.tracing import tracer
+from core.page_store import page_store
+from core.scrape_scheduler import scrape_scheduler
 
 log = get_logger("module_search")
 
 async def scrape_url(client, url):
     """Beolvassa az URL-t és tiszta szöveget csinál belőle."""
+    with tracer.span("scrape", url=url):
+        try:
+            return await page_store.get_text(client, url)
+        except Exception as e:
+            log.error(f"Scrape hiba ({url}): {e}")
+            return None
+
+async def _fetch(q: str, config: dict = None):
+    """SearXNG + scrape -> (találatok, teljes-e). Üres lista = nincs találat, None = hiba (azt nem
+    cache-eljük); nem teljes, ha egy oldal a határidőig nem töltődött le (snippet került a helyére)."""
+    search_cfg = config.get("search", {}) if config else {}
+    base_url = search_cfg.get("url", "http://127.0.0.1:8888")
+    
+    encoded_query = urllib.parse.quote_plus(q)
+    url = f"{base_url}/search?q={encoded_query}&format=json"
+    
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-        resp = await client.get(url, timeout=5.0, follow_redirects=True, headers=headers)
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            for s in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
-                s.decompose()
-            text = soup.get_text(separator=' ', strip=True)
-            return text[:3000] 
+        client = http_clients.get("searxng")
+        with tracer.span("searxng"):
+            response = await client.get(url)
+        if response.status_code != 200: return None, False
+            
+        raw_results = response.json().get("results", [])[:3]
+        if not raw_results: return [], True
+
+        # Hostonkénti limit + közös határidő: ami addig nem jön le, ott a SearXNG snippet marad
+        scrape_client = http_clients.get("scrape")
+        with tracer.span("scrape_phase") as span:
+            scraped_data, missed = await scrape_scheduler.gather(
+                [lambda u=r.get("url"): scrape_url(scrape_client, u) for r in raw_results]
+            )
+            span["missed"] = missed
+
+        formatted_results = []
+        for i, r in enumerate(raw_results):
+            content = scraped_data[i] if (i < len(scraped_data) and scraped_data[i]) else r.get("content", "")
+            formatted_results.append({
+                "title": r.get("title", "Cím nélkül"),
+                "link": r.get("url", ""),
+                "content": content
+            })
+        
+        # A letöltött oldalak a háttérben a vektor indexbe is bekerülnek
+        memory_indexer.tasks.spawn(memory_indexer.index_many(
+            "page", [(res["link"], res["content"]) for res in formatted_results if res["link"]]
+        ))
+        return formatted_results, missed == 0
+
     except Exception as e:
-        log.error(f"Scrape hiba ({url}): {e}")
-        return None
+        log.error(f"Search modul kritikus hiba: {e}")
+        return None, False
+
+async def _fetch_and_store(q: str, query_hash: str, config: dict = None):
+    results, complete = await _fetch(q, config)
+    if results is not None:
+        # A lekésett oldalak a háttérben az oldaltárba kerülnek, a hiányos találatot csak rövid ideig tartjuk
+        ttl = None if complete else scrape_scheduler.partial_ttl
+        await search_cache.put(query_hash, q, results, ttl_seconds=ttl)
+        log.info(f"Keresés kész ('{q}'), cache TTL: {ttl or search_cache.ttl_for(q)}s.")
+    return results
 
 async def execute(query: str, config: dict = None):
-    db = DBManager()
-    
     # 1. Query tisztítás és Hash
     q = query.lower()
     q = re.sub(r"^(szia|üdv|helló|mondd meg|keress rá)[\s,]*", "", q).strip()
@@ -35,47 +84,21 @@ async def execute(query: str, config: dict = None):
     
     query_hash = hashlib.md5(q.encode()).hexdigest()
 
-    # 2. Cache ellenőrzés a DBManageren keresztül (NINCS SQL ITT)
-    cached_data = db.get_cached_search(query_hash)
-    if cached_data:
-        log.info(f"CACHE TALÁLAT: '{q}' adatai az adatbázisból betöltve.")
-        return cached_data
+    # 2. Cache: memória LRU -> SQLite (lejárt, de még kiszolgálható találat háttérfrissítéssel)
+    with tracer.span("search_cache"):
+        cached = await search_cache.get(query_hash)
+    if cached is not None:
+        results, state = cached
+        if state == "stale":
+            log.info(f"CACHE (lejárt): '{q}' kiszolgálva, frissítés a háttérben.")
+            search_cache.revalidate(
+                query_hash, lambda: search_flight.do(query_hash, lambda: _fetch_and_store(q, query_hash, config))
+            )
+        else:
+            log.info(f"CACHE TALÁLAT: '{q}'" + (" (nincs találat, negatív cache)" if not results else ""))
+        return results
 
     # 3. Keresés indítása
-    search_cfg = config.get("search", {}) if config else {}
-    base_url = search_cfg.get("url", "http://127.0.0.1:8888")
-    
     log.info(f"Nincs érvényes cache. SearXNG indítása: '{q}'")
-    
-    encoded_query = urllib.parse.quote_plus(q)
-    url = f"{base_url}/search?q={encoded_query}&format=json"
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10.0)
-            if response.status_code != 200: return []
-                
-            raw_results = response.json().get("results", [])[:3]
-            if not raw_results: return []
-
-            scrape_tasks = [scrape_url(client, r.get("url")) for r in raw_results]
-            scraped_data = await asyncio.gather(*scrape_tasks)
-
-            formatted_results = []
-            for i, r in enumerate(raw_results):
-                content = scraped_data[i] if (i < len(scraped_data) and scraped_data[i]) else r.get("content", "")
-                formatted_results.append({
-                    "title": r.get("title", "Cím nélkül"),
-                    "link": r.get("url", ""),
-                    "content": content
-                })
-            
-            # 4. Mentés az adatbázisba (Javított változónévvel: formatted_results)
-            db.save_search_to_cache(query_hash, q, json.dumps(formatted_results))
-            log.info(f"Keresés kész. Eredmények 12 órára cache-elve.")
-            
-            return formatted_results 
-
-    except Exception as e:
-        log.error(f"Search modul kritikus hiba: {e}")
-        return []
\ No newline at end of file
+    # Az azonos, párhuzamosan érkező kérdések (pl. OpenWebUI cím/follow-up kérései) egy keresésen osztoznak
+    return await search_flight.do(query_hash, lambda: _fetch_and_store(q, query_hash, config)) or []
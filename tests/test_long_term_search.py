@@ -0,0 +1,22 @@
+import pytest
+from core.database import DBManager, _stem
+
+@pytest.mark.parametrize("word, stem", [
+    ("debrecenben", "debrecen"),
+    ("budapesten", "budapest"),
+    ("szegednek", "szeged"),
+    ("győrből", "győr"),
+    ("laknak", "laknak"),   # a 'lak' tő túl rövid lenne
+    ("város", "város"),
+])
+def test_stem_strips_case_endings(word, stem):
+    assert _stem(word) == stem
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_inflected_question_finds_subject(tmp_path, fts):
+    db = DBManager(str(tmp_path / "t.db"))
+    db.fts_enabled = fts and db.fts_enabled
+    db.add_long_term_memory("Debrecen", "lakossága", "kb. 200 ezer fő")
+    db.add_long_term_memory("Szeged", "folyója", "Tisza")
+    rows = db.search_long_term_memories("Debrecenben hányan laknak")
+    assert rows and rows[0][0] == "Debrecen"
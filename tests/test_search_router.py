@@ -0,0 +1,25 @@
+import pytest
+from core.search_router import HeuristicRouter, normalize_query
+
+router = HeuristicRouter()
+
+@pytest.mark.parametrize("message, expected", [
+    # Egyértelmű adatkérés -> keresés
+    ("Ki Debrecen polgármestere?", True),
+    ("Mennyi a mai euró árfolyam?", True),
+    ("Milyen idő lesz holnap? Időjárás Szeged", True),
+    ("Mikor van nyitva a posta?", True),
+    ("Mennyibe kerül egy iPhone 16?", True),
+    # Csevegés, kód, nyelvi feladat -> belső
+    ("Szia, hogy vagy?", False),
+    ("Írj egy verset a tavaszról", False),
+    ("Javítsd ki ezt a python kódot", False),
+    # Puszta idő- és árszavak: nem biztos, a cache / LLM dönt
+    ("Mit csinálsz most?", None),
+    ("Hogy telt a napod ma?", None),
+    ("Most mesélj egy viccet", None),
+    ("Ma nagyon fáradt vagyok, mit tanácsolsz?", None),
+    ("Mi az ára a szeretetnek?", None),
+])
+def test_heuristic_classification(message, expected):
+    assert router.classify(normalize_query(message)) is expected
@@ -0,0 +1,63 @@
+import asyncio
+from core.singleflight import SingleFlight
+
+def test_cancelling_only_waiter_cancels_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def fetch():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flight.do("q", fetch))
+        await started.wait()
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert flight.get_stats()["inflight"] == 0
+        assert flight.stats["cancelled"] == 1
+
+    asyncio.run(scenario())
+
+def test_work_continues_while_another_waiter_remains():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "eredmény"
+
+        first = asyncio.create_task(flight.do("q", fetch))
+        second = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "eredmény"
+        assert calls == [1]
+        assert flight.stats["cancelled"] == 0
+
+    asyncio.run(scenario())
+
+def test_new_call_after_cancel_starts_fresh_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        waiter = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert await flight.do("q", fetch) == 2
+
+    asyncio.run(scenario())
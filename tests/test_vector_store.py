@@ -0,0 +1,39 @@
+import json
+import numpy as np
+from core.vector_store import VectorStore
+
+def _populate(path):
+    store = VectorStore(path=str(path))
+    store.add("note", "a", "alpha", [1, 0, 0, 0])
+    store.add("note", "b", "beta", [0, 1, 0, 0])
+    return store
+
+def test_reload_after_orphan_vector_keeps_rows_aligned(tmp_path):
+    store = _populate(tmp_path)
+    # Félbemaradt hozzáfűzés: a vektor kiíródott, a meta sor már nem
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.asarray([0, 0, 1, 0], dtype=np.float32).tobytes())
+
+    store = VectorStore(path=str(tmp_path))
+    assert len(store) == 2
+    store.add("note", "c", "gamma", [0, 0, 0, 1])
+
+    store = VectorStore(path=str(tmp_path))
+    score, meta = store.search([0, 0, 0, 1], k=1)[0]
+    assert meta["text"] == "gamma"
+    assert score > 0.99
+
+def test_reload_after_orphan_and_torn_meta_lines(tmp_path):
+    store = _populate(tmp_path)
+    with open(store.meta_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"kind": "note", "ref": "x", "text": "orphan"}) + "\n")
+        f.write('{"kind": "note", "ref": "y", "te')
+
+    store = VectorStore(path=str(tmp_path))
+    assert len(store) == 2
+    assert not store.contains("note", "x")
+    store.add("note", "c", "gamma", [0, 0, 0, 1])
+
+    store = VectorStore(path=str(tmp_path))
+    assert [m["text"] for m in store.meta] == ["alpha", "beta", "gamma"]
+    assert store.search([0, 0, 0, 1], k=1)[0][1]["text"] == "gamma"
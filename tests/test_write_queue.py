@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from core.database import DBManager
+from core.write_queue import WriteQueue, WriteQueueClosed
+
+def test_write_after_close_raises(tmp_path):
+    async def scenario():
+        wq = WriteQueue()
+        wq.start(DBManager(str(tmp_path / "t.db")))
+        await wq.write("set_setting", "a", 1)
+        await asyncio.to_thread(wq.close)
+        with pytest.raises(WriteQueueClosed):
+            await wq.write("set_setting", "b", 2)
+
+    asyncio.run(scenario())
+
+def test_failed_item_in_batch_is_reported_not_resolved_as_success(tmp_path):
+    async def scenario():
+        db = DBManager(str(tmp_path / "t.db"))
+        wq = WriteQueue()
+        wq.start(db)
+        # A második írás NOT NULL hibára fut (content): a batch visszagörgetődik, egyenként újrapróbáljuk
+        results = await asyncio.gather(
+            wq.write("set_setting", "ok", 1),
+            wq.write("add_message", "conv", "user", None),
+            return_exceptions=True,
+        )
+        await asyncio.to_thread(wq.close)
+        assert not isinstance(results[0], Exception)
+        assert isinstance(results[1], Exception)
+        assert db.get_setting("ok") == "1"
+        assert wq.stats["failed"] == 1
+
+    asyncio.run(scenario())